@@ -1,11 +1,17 @@
 # ez_example.py
+import asyncio
+import contextvars
 import time
 import random
+from concurrent.futures import ThreadPoolExecutor
 from kansatsu import Kansatsu
 
 # http://127.0.0.1:9999/update
 kansatsu = Kansatsu(service_name="my-llm-app", service_version="1.0.1")
 
+# Worker threads for blocking calls that should overlap with the LLM request
+_EX = ThreadPoolExecutor(max_workers=4)
+
 # A mock class to simulate an LLM API response
 class MockLLMResponse:
     def __init__(self, text, prompt_tokens, completion_tokens):
@@ -19,9 +25,9 @@ class MockLLMResponse:
         self.usage = Usage(prompt_tokens, completion_tokens)
 
 @kansatsu.monitor(span_name="llm_call_to_provider", track_tokens=True, log_io=True)
-def call_llm(prompt: str):
+async def call_llm(prompt: str):
     print(f"Calling LLM with prompt: '{prompt}'")
-    time.sleep(random.uniform(0.5, 1.5)) # Simulate network latency
+    await asyncio.sleep(random.uniform(0.5, 1.5)) # Simulate network latency
     # Simulate a response with PII
     response_text = "The patient's name is John Doe and his MRN is 12345. Call him at 555-867-5309."
     return MockLLMResponse(
@@ -36,27 +42,36 @@ def query_database(query: str):
     time.sleep(random.uniform(0.1, 0.3))
     return {"status": "success", "rows": random.randint(1, 100)}
 
-if __name__ == "__main__":
-    try:
-        for i in range(10):
-            print(f"\n--- Interaction {i+1} ---")
-            start_time = time.perf_counter()
+async def interaction(i: int):
+    with kansatsu.get_tracer().start_as_current_span("user_interaction") as interaction_span:
+        start_time = time.perf_counter()
 
-            # The decorators will automatically log performance and tokens
-            llm_response = call_llm(prompt=f"This is my prompt number {i}")
-            db_result = query_database(query="SELECT * FROM users;")
+        # The decorators will automatically log performance and tokens.
+        # The LLM call and the (blocking) database query don't depend on each other, so run
+        # the query on a worker thread meanwhile. copy_context() carries the current span over
+        # so the query still nests under this interaction.
+        db_future = asyncio.get_running_loop().run_in_executor(
+            _EX, contextvars.copy_context().run, query_database, "SELECT * FROM users;"
+        )
+        llm_response, db_result = await asyncio.gather(call_llm(prompt=f"This is my prompt number {i}"), db_future)
 
-            # Check the LLM output for PII
-            rai_results = kansatsu.check_responsible_ai(llm_response.text, kansatsu.get_tracer().get_current_span())
-            if rai_results["pii_found"]:
-                print(f"👺 PII Found: {rai_results['findings']}")
+        # Check the LLM output for PII
+        rai_results = kansatsu.check_responsible_ai(llm_response.text, interaction_span)
+        if rai_results["pii_found"]:
+            print(f"👺 Interaction {i+1} PII Found: {rai_results['findings']}")
 
-            # Log end-to-end interaction time and user feedback
-            end_time = time.perf_counter()
-            kansatsu.log_interaction_time((end_time - start_time) * 1000)
-            kansatsu.log_quality_feedback(random.randint(3, 5)) # Simulate a user rating of 3, 4, or 5
+        # Log end-to-end interaction time and user feedback
+        end_time = time.perf_counter()
+        kansatsu.log_interaction_time((end_time - start_time) * 1000)
+        kansatsu.log_quality_feedback(random.randint(3, 5)) # Simulate a user rating of 3, 4, or 5
 
-            time.sleep(2) # Wait before the next interaction
+async def main():
+    # The interactions wait on (simulated) network I/O, so run them concurrently
+    await asyncio.gather(*(interaction(i) for i in range(10)))
 
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
     finally:
+        _EX.shutdown()
         kansatsu.shutdown()
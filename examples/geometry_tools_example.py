@@ -3,17 +3,26 @@
 import os
 import json
 import logging
+import math
 import re
 import time
 from typing import Dict, Any, Optional
 
 # Our observability module
-from kansatsu import Kansatsu
+from kansatsu import Kansatsu, SemanticCache
 
 import vertexai
 from vertexai.generative_models import GenerativeModel
+from vertexai.language_models import TextEmbeddingModel
 from opentelemetry import trace
 
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional: without it the tool kernels simply run as plain Python.
+    def njit(*args, **kwargs):
+        return lambda func: func
+
 # --- Configuration ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -23,11 +32,16 @@ try:
     GCP_PROJECT_ID = '<your-gcp-project-id>'  # <--- CHANGE THIS
     GCP_LOCATION = '<your-location>'    # <--- CHANGE THIS
     GEMINI_MODEL_NAME = 'gemini-2.5-flash' # Using Flash for speed and cost
+    EMBEDDING_MODEL_NAME = 'text-embedding-004'
     logging.info("✅ Configuration loaded. Make sure you are authenticated with gcloud.")
 except Exception as e:
     logging.error(f"❌ ERROR: Could not load configuration. Details: {e}")
     raise
 
+_PI = math.pi
+_NUM_RE = re.compile(r"[-+]?\d*\.\d+|\d+")
+_VALID_SCORES = frozenset("12345")
+
 # --- Initialize Observability ---
 obs = Kansatsu(
     service_name="math-agent",
@@ -36,19 +50,22 @@ obs = Kansatsu(
 )
 
 @obs.monitor()
+@njit(cache=True, fastmath=True)
 def calculate_square_area(side: float) -> float:
     return side * side
 
 @obs.monitor()
+@njit(cache=True, fastmath=True)
 def calculate_rectangle_area(length: float, width: float) -> float:
     return length * width
 
 @obs.monitor()
+@njit(cache=True, fastmath=True)
 def calculate_circle_area(radius: float) -> float:
-    import math
-    return math.pi * (radius ** 2)
+    return _PI * radius * radius
 
 @obs.monitor()
+@njit(cache=True, fastmath=True)
 def calculate_triangle_area(base: float, height: float) -> float:
     return 0.5 * base * height
 
@@ -60,37 +77,64 @@ TOOL_SCHEMA = {
 }
 
 class MathAgent:
-    def __init__(self, llm: GenerativeModel, tools: Dict, observability: Kansatsu):
+    def __init__(self, llm: GenerativeModel, embedding_model: TextEmbeddingModel, tools: Dict, observability: Kansatsu):
         self.llm = llm
+        self.embedding_model = embedding_model
         self.tools = tools
         self.obs = observability
         self.conversation_state = {}
+        self._tools_json = json.dumps({k: {"description": v["description"], "parameters": v["parameters"]} for k, v in tools.items()}, indent=2, sort_keys=True)
+        # "required" lists each tool's parameters in signature order, so the tool can be called positionally.
+        self._dispatch = {
+            name: (v["function"], tuple(v["required"]), {p: v["parameters"][p]["description"] for p in v["required"]})
+            for name, v in tools.items()
+        }
+        # Paraphrased queries ("circle radius 10" vs "area of a circle with r=10") reuse an
+        # earlier intent, but only when they carry the same numbers.
+        self.intent_cache = SemanticCache(
+            embed_fn=self._embed_query,
+            threshold=0.9,
+            partition_fn=lambda query: tuple(_NUM_RE.findall(query)),
+        )
         self.reset_state()
 
     def reset_state(self):
         self.conversation_state = {"current_tool": None, "collected_params": {}, "next_param_to_ask": None}
 
-    # The decorator now handles token tracking automatically because the Gemini response
-    # object has a `usage_metadata` attribute that the decorator knows how to parse.
-    @obs.monitor(log_io=True, track_tokens=True)
+    @obs.monitor()
+    def _embed_query(self, user_query: str):
+        return self.embedding_model.get_embeddings([user_query])[0].values
+
+    @obs.monitor(log_io=True)
     def _understand_and_extract(self, user_query: str) -> Optional[Dict]:
         """Uses the LLM to determine the user's intent and extract any available parameters."""
+        return self.obs.cache_llm(self.intent_cache, user_query, self._classify_intent, user_query)
+
+    # The decorator now handles token tracking automatically because the Gemini response
+    # object has a `usage_metadata` attribute that the decorator knows how to parse.
+    @obs.monitor(track_tokens=True)
+    def _generate_intent(self, prompt: str):
+        return self.llm.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+
+    def _classify_intent(self, user_query: str) -> Optional[Dict]:
+        # Everything before the user query is identical on every call so Gemini's implicit
+        # prompt caching can reuse it; keep per-turn content at the very end.
         prompt = f"""
         You are an expert at routing user requests to the correct tool.
         Analyze the user's query and determine which tool to use and what parameters have been provided.
 
         **Available Tools:**
-        {json.dumps({k: {"description": v["description"], "parameters": v["parameters"]} for k, v in self.tools.items()}, indent=2)}
-
-        **User Query:**
-        "{user_query}"
+        {self._tools_json}
 
         **Your Task:**
         Respond with a single JSON object containing:
         1. "tool_name": The name of the best-matching tool from the list. If no tool matches, use "unknown".
         2. "parameters": A JSON object containing any parameters you could extract from the user's query.
+
+        **User Query:**
+        "{user_query}"
         """
-        response_obj = self.llm.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+        response_obj = self._generate_intent(prompt)
 
         if response_obj and response_obj.text:
             try:
@@ -103,14 +147,14 @@ class MathAgent:
     @obs.monitor(log_io=True)
     def chat(self, user_input: str) -> str:
         if self.conversation_state["next_param_to_ask"]:
-            try:
-                found_number = float(re.findall(r"[-+]?\d*\.\d+|\d+", user_input)[0])
-                param_name = self.conversation_state["next_param_to_ask"]
-                self.conversation_state["collected_params"][param_name] = found_number
-                logging.info(f"Collected parameter '{param_name}' = {found_number}")
-                self.conversation_state["next_param_to_ask"] = None
-            except (ValueError, IndexError):
+            match = _NUM_RE.search(user_input)
+            if match is None:
                 return f"I'm sorry, I didn't understand that. Please provide a number for the {self.conversation_state['next_param_to_ask']}."
+            found_number = float(match.group(0))
+            param_name = self.conversation_state["next_param_to_ask"]
+            self.conversation_state["collected_params"][param_name] = found_number
+            logging.info(f"Collected parameter '{param_name}' = {found_number}")
+            self.conversation_state["next_param_to_ask"] = None
 
         if not self.conversation_state["current_tool"]:
             intent_data = self._understand_and_extract(user_input)
@@ -123,20 +167,17 @@ class MathAgent:
             logging.info(f"Intent recognized. Tool: '{tool_name}', Initial params: {self.conversation_state['collected_params']}")
 
         tool_name = self.conversation_state["current_tool"]
-        tool_info = self.tools[tool_name]
-        required_params = tool_info["required"]
+        tool_function, required_params, param_descriptions = self._dispatch[tool_name]
         collected_params = self.conversation_state["collected_params"]
 
         for param in required_params:
             if param not in collected_params:
                 self.conversation_state["next_param_to_ask"] = param
-                param_description = tool_info["parameters"][param]["description"]
-                return f"I can help with that. What is {param_description.lower()}"
+                return f"I can help with that. What is {param_descriptions[param].lower()}"
 
         logging.info(f"All parameters collected. Executing tool '{tool_name}'.")
-        tool_function = tool_info["function"]
         try:
-            result = tool_function(**collected_params)
+            result = tool_function(*(collected_params[p] for p in required_params))
             response = f"The area is {result:.2f}."
         except Exception as e:
             response = f"An error occurred during calculation: {e}"
@@ -147,7 +188,8 @@ if __name__ == "__main__":
     try:
         vertexai.init(project=GCP_PROJECT_ID, location=GCP_LOCATION)
         gemini_model = GenerativeModel(GEMINI_MODEL_NAME)
-        agent = MathAgent(gemini_model, TOOL_SCHEMA, obs)
+        embedding_model = TextEmbeddingModel.from_pretrained(EMBEDDING_MODEL_NAME)
+        agent = MathAgent(gemini_model, embedding_model, TOOL_SCHEMA, obs)
         logging.info("✅ Math Agent initialized successfully.")
 
         print("\n🤖 Math Agent is ready. Ask me to calculate an area!")
@@ -156,7 +198,8 @@ if __name__ == "__main__":
 
         while True:
             user_input = input("\n> Your Query: ")
-            if user_input.lower() in ['exit', 'quit']:
+            command = user_input.strip()
+            if len(command) == 4 and command.lower() in ('exit', 'quit'):
                 break
 
             tracer = obs.get_tracer()
@@ -175,11 +218,10 @@ if __name__ == "__main__":
 
                 # Ask for quality feedback
                 quality_score_input = input("Rate response quality (1-5, or press Enter to skip): ")
-                if quality_score_input.isdigit() and 1 <= int(quality_score_input) <= 5:
+                if quality_score_input in _VALID_SCORES:
                     obs.log_quality_feedback(int(quality_score_input))
                     print("Thank you for your feedback!")
 
     finally:
         print("\nExiting application...")
-        if 'obs' in locals():
-            obs.shutdown()
\ No newline at end of file
+        obs.shutdown()
\ No newline at end of file
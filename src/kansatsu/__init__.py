@@ -3,7 +3,8 @@
 __version__ = "0.1.5"
 
 from .agent import Kansatsu
+from .cache import SemanticCache
 
 # This allows users to do `from kansatsu import Kansatsu`
 # instead of `from kansatsu.agent import Kansatsu`
-__all__ = ["Kansatsu"]
+__all__ = ["Kansatsu", "SemanticCache"]
@@ -2,24 +2,235 @@
 
 import time
 import logging
-import json
 import os
 import functools
-from typing import Any, Callable, Dict
+import collections
+import itertools
+import hashlib
+import heapq
+import inspect
+from typing import Any, Callable, Dict, List, Optional, Set
 import threading
+import queue
 import re
+import weakref
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 import spacy
 
 from opentelemetry import trace
 from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import ConsoleSpanExporter, SimpleSpanProcessor
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
 from opentelemetry.sdk.resources import Resource
 from opentelemetry.trace import Status, StatusCode
 
+from .cache import SemanticCache
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+try:
+    from opentelemetry.exporter.otlp.proto.http import Compression
+    from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+except ImportError:
+    OTLPSpanExporter = None
+
 logging.basicConfig(format='%(asctime)s -- [%(levelname)s] -- %(message)s', level=logging.INFO)
 
+# PII pattern sources as {pii_type: (pattern, flags)}. The same sources are compiled into a
+# single Hyperscan database or RE2 set (when either is installed) so one pass tells us which
+# pattern types can possibly match before running the positional `re` scans.
+_COMPLEX_PII_PATTERNS = {
+    "CREDIT_CARD": (r'\b(?:credit card|card|cc)[\s\w:;#-]*?((?:\d[ -]*?){13,16})\b', re.IGNORECASE),
+    "MRN": (r'\b(mrn|medical record|patient id|medical number|medical id)[\s\w:;#-]*?(\w[\w-]*\w)\b', re.IGNORECASE),
+    "DATE_OF_BIRTH": (r'\b(dob|date of birth|birthday|birth date)[\s\w:;#-]*?(\d{1,2}[-/]\d{1,2}[-/]\d{2,4}|\b(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s\d{1,2},?\s\d{2,4})\b', re.IGNORECASE),
+}
+_SIMPLE_PII_PATTERNS = {
+    "SSN": (r'\b\d{3}[-]\d{2}[-]\d{4}\b', 0),
+    "EMAIL": (r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', 0),
+    "PHONE_NUMBER_US": (r'\b\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b', 0),
+}
+_COMPLEX_PII_REGEXES = tuple((pii_type, re.compile(pattern, flags)) for pii_type, (pattern, flags) in _COMPLEX_PII_PATTERNS.items())
+_SIMPLE_PII_REGEXES = tuple((pii_type, re.compile(pattern, flags)) for pii_type, (pattern, flags) in _SIMPLE_PII_PATTERNS.items())
+_CARD_STRIP_RE = re.compile(r'[\s-]')
+_DIGIT_RE = re.compile(r'\d')
+# ASCII characters that Python's \s matches but the RE2/Hyperscan prefilter may not (RE2's \s
+# has no \v, and neither engine treats \x1c-\x1f as whitespace).
+_PREFILTER_UNSAFE_RE = re.compile(r'[\v\x1c-\x1f]')
+
+# `monitor(log_io=True)` only captures payloads when KANSATSU_LOG_IO=1 is set; otherwise just the
+# argument count and the result type/size are recorded.
+_LOG_IO_ENABLED = os.environ.get("KANSATSU_LOG_IO", "0").lower() in ("1", "true", "yes")
+_LOG_IO_MAX_CHARS = int(os.environ.get("KANSATSU_LOG_IO_MAX_CHARS", "512"))
+# Containers are cut to this many items (and nesting depth) before serialization, so capture
+# cost stays bounded however large the arguments are.
+_LOG_IO_MAX_ITEMS = 32
+_LOG_IO_MAX_DEPTH = 3
+
+def _clip_for_log(value: Any, depth: int = 0) -> Any:
+    if isinstance(value, str):
+        return value[:_LOG_IO_MAX_CHARS]
+    if isinstance(value, (bytes, bytearray)):
+        return repr(value[:_LOG_IO_MAX_CHARS])
+    if isinstance(value, (dict, list, tuple)) and depth >= _LOG_IO_MAX_DEPTH:
+        return f"<{type(value).__name__} of {len(value)} items>"
+    if isinstance(value, dict):
+        return {str(k): _clip_for_log(v, depth + 1) for k, v in itertools.islice(value.items(), _LOG_IO_MAX_ITEMS)}
+    if isinstance(value, (list, tuple)):
+        return [_clip_for_log(v, depth + 1) for v in value[:_LOG_IO_MAX_ITEMS]]
+    return value
+
+def _json_default(value: Any) -> Any:
+    # orjson fallback for values it can't encode itself (Decimal and other number-likes, then anything).
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+# Only the slowest methods (by total time) are listed in the printed summary.
+_SUMMARY_TOP_METHODS = 50
+
+# Number of distinct texts whose PII scan results are kept for reuse.
+_RAI_CACHE_SIZE = 4096
+
+# Characters of already-streamed text re-checked with each new chunk, so a pattern split
+# across a chunk boundary is still seen by the early prefilter.
+_RAI_STREAM_OVERLAP = 256
+
+# Dashboard events are sent from a background thread: it waits up to _TX_WINDOW_S after the
+# first queued event for more to arrive and posts up to _TX_MAX_BATCH of them in one request.
+_TX_QUEUE_SIZE = 10_000
+_TX_WINDOW_S = 0.05
+_TX_MAX_BATCH = 128
+_TX_STOP = object()
+
+# spaCy is skipped when regex matches already cover this share of the non-whitespace text.
+_NER_SKIP_COVERAGE = 0.95
+_NER_BATCH_SIZE = 64
+
+# spaCy entity labels reported as PII, and the PII type each one maps to.
+_SPACY_TO_PII = {"PERSON": "PERSON_NAME", "GPE": "LOCATION", "LOC": "LOCATION", "DATE": "DATE_ENTITY", "ORG": "ORGANIZATION"}
+_SPACY_LABELS = frozenset(_SPACY_TO_PII)
+
+# Only the NER component is used, so the rest of the pipeline is excluded at load time (the
+# sm model's NER has its own tok2vec). `disable=` would still load these pipes, just not run them.
+_SPACY_EXCLUDED_PIPES = ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer"]
+
+# The PII prefilter set and the spaCy model are process-wide: every Kansatsu instance shares
+# one copy, built on first use.
+_shared_lock = threading.Lock()
+_PII_SET = None
+_NLP = None
+
+class _HyperscanSet:
+    # Mirrors the re2.Set interface used by Kansatsu: Match(text) returns the ids of every
+    # pattern that matches somewhere in text. Scratch space is per-thread since a Hyperscan
+    # scratch cannot be used by two scans at once.
+    def __init__(self, patterns):
+        self._db = hyperscan.Database()
+        self._db.compile(
+            expressions=[pattern.encode() for pattern, _ in patterns],
+            ids=list(range(len(patterns))),
+            elements=len(patterns),
+            flags=[hyperscan.HS_FLAG_SINGLEMATCH | (hyperscan.HS_FLAG_CASELESS if flags & re.IGNORECASE else 0)
+                   for _, flags in patterns],
+        )
+        self._scratch = hyperscan.Scratch(self._db)
+        self._local = threading.local()
+
+    def Match(self, text: str) -> List[int]:
+        scratch = getattr(self._local, "scratch", None)
+        if scratch is None:
+            scratch = self._local.scratch = self._scratch.clone()
+        matched = []
+        self._db.scan(text.encode(), match_event_handler=lambda pattern_id, *_: matched.append(pattern_id), scratch=scratch)
+        return matched
+
+def _build_hyperscan_set():
+    patterns = {**_COMPLEX_PII_PATTERNS, **_SIMPLE_PII_PATTERNS}
+    try:
+        return _HyperscanSet(list(patterns.values())), tuple(patterns)
+    except hyperscan.error as e:
+        logging.warning(f"👹 Could not compile PII patterns with Hyperscan, trying RE2. Error: {e}")
+        return None, ()
+
+def _build_pii_set():
+    if hyperscan is not None:
+        pii_set, labels = _build_hyperscan_set()
+        if pii_set is not None:
+            return pii_set, labels
+    if re2 is None:
+        return None, ()
+    pii_set = re2.Set.SearchSet()
+    labels = []
+    try:
+        for pii_type, (pattern, flags) in {**_COMPLEX_PII_PATTERNS, **_SIMPLE_PII_PATTERNS}.items():
+            pii_set.Add(("(?i)" if flags & re.IGNORECASE else "") + pattern)
+            labels.append(pii_type)
+        pii_set.Compile()
+    except re2.error as e:
+        logging.warning(f"👹 Could not compile PII patterns with RE2, falling back to 're'. Error: {e}")
+        return None, ()
+    return pii_set, tuple(labels)
+
+def get_pii_set() -> tuple:
+    global _PII_SET
+    if _PII_SET is None:
+        with _shared_lock:
+            if _PII_SET is None:
+                _PII_SET = _build_pii_set()
+    return _PII_SET
+
+def get_nlp():
+    # Returns the shared spaCy NER pipeline, or None if the model is not installed.
+    global _NLP
+    if _NLP is None:
+        with _shared_lock:
+            if _NLP is None:
+                try:
+                    logging.info("Loading spaCy NER model...")
+                    _NLP = spacy.load("en_core_web_sm", exclude=_SPACY_EXCLUDED_PIPES)
+                    logging.info("✅ spaCy NER model loaded successfully.")
+                except OSError:
+                    logging.error("❌ spaCy model 'en_core_web_sm' not found. Please run 'python -m spacy download en_core_web_sm'")
+                    _NLP = False
+    return _NLP or None
+
+# Byte masks for SWAR Luhn over a 16-digit card held little-endian in one int: byte k is the
+# k-th digit from the left, and the digits doubled by Luhn are the ones at even k.
+_SWAR_ASCII_ZERO = int.from_bytes(b"0" * 16, "little")
+_SWAR_EVEN_BYTES = int.from_bytes(b"\xff\x00" * 8, "little")
+_SWAR_ODD_BYTES = _SWAR_EVEN_BYTES << 8
+_SWAR_EVEN_SIX = int.from_bytes(b"\x06\x00" * 8, "little")
+_SWAR_EVEN_ONE = int.from_bytes(b"\x01\x00" * 8, "little")
+_SWAR_BYTE_SUM = int.from_bytes(b"\x01" * 16, "little")
+
+def _luhn16_checksum(card_number: str) -> int:
+    digits = int.from_bytes(card_number.encode("ascii"), "little") - _SWAR_ASCII_ZERO
+    doubled = (digits & _SWAR_EVEN_BYTES) << 1
+    # A doubled digit of 10..18 becomes 1..9: adding 6 carries into bit 4 exactly for those bytes.
+    doubled -= (((doubled + _SWAR_EVEN_SIX) >> 4) & _SWAR_EVEN_ONE) * 9
+    total = (digits & _SWAR_ODD_BYTES) + doubled
+    # Multiplying by 0x0101...01 accumulates every byte into the top one (the sum is at most 144).
+    return ((total * _SWAR_BYTE_SUM) >> 120) & 0xFF
+
+# The same card numbers tend to recur across a conversation, so results are memoised.
+@functools.lru_cache(maxsize=4096)
 def is_luhn_valid(card_number: str) -> bool:
+    if len(card_number) == 16 and card_number.isascii() and card_number.isdigit():
+        return _luhn16_checksum(card_number) % 10 == 0
     try:
         digits = [int(d) for d in card_number]
         checksum = 0
@@ -33,11 +244,71 @@ def is_luhn_valid(card_number: str) -> bool:
     except (ValueError, TypeError):
         return False
 
+# Token usage readers, one per response shape. The shape is worked out once per result type
+# and then looked up, instead of probing attributes on every monitored call.
+def _gemini_usage(result) -> tuple:
+    usage = result.usage_metadata
+    if usage is None:
+        return 0, 0, 0
+    return usage.prompt_token_count, usage.candidates_token_count, usage.total_token_count
+
+def _openai_usage(result) -> tuple:
+    usage = result.usage
+    if usage is None:
+        return 0, 0, 0
+    return usage.prompt_tokens, usage.completion_tokens, usage.total_tokens
+
+def _anthropic_usage(result) -> tuple:
+    usage = result.usage
+    if usage is None:
+        return 0, 0, 0
+    return usage.input_tokens, usage.output_tokens, usage.input_tokens + usage.output_tokens
+
+def _legacy_usage(result) -> tuple:
+    usage = result.usage
+    prompt_tokens = getattr(usage, "prompt_tokens", 0)
+    completion_tokens = getattr(usage, "completion_tokens", 0)
+    return prompt_tokens, completion_tokens, getattr(usage, "total_tokens", prompt_tokens + completion_tokens)
+
+def _no_usage(result) -> tuple:
+    return 0, 0, 0
+
+_USAGE_ADAPTERS: Dict[type, Callable[[Any], tuple]] = {}
+
+def _resolve_usage_adapter(result) -> Callable[[Any], tuple]:
+    cacheable = True
+    if hasattr(result, 'usage_metadata'):
+        adapter = _gemini_usage
+    elif hasattr(result, 'usage'):
+        usage = result.usage
+        if hasattr(usage, 'prompt_tokens'):
+            adapter = _openai_usage
+        elif hasattr(usage, 'input_tokens'):
+            adapter = _anthropic_usage
+        else:
+            # A missing usage says nothing about the shape of the next result of this type.
+            adapter = _legacy_usage
+            cacheable = usage is not None
+    else:
+        adapter = _no_usage
+    if cacheable:
+        _USAGE_ADAPTERS[type(result)] = adapter
+    return adapter
+
 class Kansatsu:
-    def __init__(self, service_name: str, service_version: str = "1.0.0", dashboard_url: str = "http://127.0.0.1:8050/update"):
+    def __init__(self, service_name: str, service_version: str = "1.0.0", dashboard_url: str = "http://127.0.0.1:8050/update",
+                 sampling_ratio: float = 1.0, batch_max_queue: int = 2048, batch_size: int = 512, export_interval_ms: int = 5000,
+                 metrics_flush_interval_s: float = 5.0, metrics_flush_size: int = 100, otlp_endpoint: Optional[str] = None):
         self.service_name = service_name
         self.service_version = service_version
         self.dashboard_url = dashboard_url
+        self.sampling_ratio = sampling_ratio
+        self.batch_max_queue = batch_max_queue
+        self.batch_size = batch_size
+        self.export_interval_ms = export_interval_ms
+        self.metrics_flush_interval_s = metrics_flush_interval_s
+        self.metrics_flush_size = metrics_flush_size
+        self.otlp_endpoint = otlp_endpoint.rstrip("/") if otlp_endpoint else None
 
         self._metrics = {
             "total_calls": 0,
@@ -47,93 +318,264 @@ class Kansatsu:
             "llm_total_prompt_tokens": 0,
             "llm_total_completion_tokens": 0,
             "llm_total_tokens": 0,
+            "llm_cache_hits": 0,
+            "llm_cache_misses": 0,
             "rai_alerts": [],
-            "quality_scores": [],
+            "quality_sum": 0,
+            "quality_count": 0,
             "method_stats": {}
         }
         self._lock = threading.Lock()
+        # Per-thread counter shards: each thread only ever adds to its own dict, so the hot
+        # logging paths need no lock. Readers sum every shard, and fold the shards of threads
+        # that have exited into self._metrics (see _snapshot_metrics).
+        self._tls = threading.local()
+        self._default_stats_tpl = self._get_default_method_stats()
+        self._counter_shards = []
+        self._metric_buf = collections.deque(maxlen=4096)
+        self._metric_flush_requested = threading.Event()
+        self._metric_flusher_stopped = False
+        self._tx_q = queue.Queue(maxsize=_TX_QUEUE_SIZE)
+        self._tx_thread = None
+        self._metric_flusher = None
+        if self.dashboard_url:
+            self._session = requests.Session()
+            self._session.mount(self.dashboard_url, HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            self._tx_thread = threading.Thread(target=self._tx_loop, name="kansatsu-dashboard-tx", daemon=True)
+            self._tx_thread.start()
+            self._metric_flusher = threading.Thread(target=self._metric_flush_loop, name="kansatsu-metric-flush", daemon=True)
+            self._metric_flusher.start()
         self._setup_otel()
+        self._pii_set, self._pii_set_labels = get_pii_set()
+        self._rai_cache = collections.OrderedDict()
+        self._rai_cache_lock = threading.Lock()
 
-        try:
-            logging.info("Loading spaCy NER model...")
-            self.nlp = spacy.load("en_core_web_sm")
-            logging.info("✅ spaCy NER model loaded successfully.")
-        except OSError:
-            logging.error("❌ spaCy model 'en_core_web_sm' not found. Please run 'python -m spacy download en_core_web_sm'")
-            self.nlp = None
+    @functools.cached_property
+    def nlp(self):
+        # Loaded on first PII check so agents that never call check_responsible_ai don't pay for spaCy.
+        return get_nlp()
 
     def _send_to_dashboard(self, payload: Dict):
         if not self.dashboard_url:
             return
         try:
-            requests.post(self.dashboard_url, json=payload, timeout=0.5)
+            self._tx_q.put_nowait(payload)
+        except queue.Full:
+            if not hasattr(self, "_dashboard_drop_logged"):
+                logging.warning(f"👹 Dashboard queue is full, dropping events. Is {self.dashboard_url} keeping up?")
+                self._dashboard_drop_logged = True
+
+    def _tx_loop(self):
+        while True:
+            events, waiters, stop = [], [], False
+            try:
+                item = self._tx_q.get()
+                deadline = time.monotonic() + _TX_WINDOW_S
+                while True:
+                    if item is _TX_STOP:
+                        stop = True
+                        break
+                    if isinstance(item, threading.Event):
+                        waiters.append(item)
+                    else:
+                        events.append(item)
+                    if len(events) >= _TX_MAX_BATCH:
+                        break
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self._tx_q.get(timeout=remaining) if remaining > 0 else self._tx_q.get_nowait()
+                    except queue.Empty:
+                        break
+                self._post_events(events)
+            except Exception as e:
+                # Anything unexpected (e.g. an event that can't be encoded) costs only this batch;
+                # the sender thread keeps running.
+                if not hasattr(self, "_dashboard_batch_error_logged"):
+                    logging.warning(f"👹 Dropped {len(events)} dashboard events after an unexpected error: {e!r}")
+                    self._dashboard_batch_error_logged = True
+            finally:
+                for waiter in waiters:
+                    waiter.set()
+            if stop:
+                return
+
+    def _post_events(self, events: list):
+        if not events:
+            return
+        try:
+            self._session.post(
+                self.dashboard_url,
+                data=orjson.dumps({"type": "batch", "events": events}, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY),
+                headers={"Content-Type": "application/json"},
+                timeout=0.5,
+            )
         except requests.exceptions.RequestException as e:
             if not hasattr(self, "_dashboard_error_logged"):
                 logging.warning(f"👹 Could not connect to dashboard at {self.dashboard_url}. Is it running? Error: {e}")
                 self._dashboard_error_logged = True
 
+    def flush(self, timeout: float = 5.0) -> bool:
+        # Sends any buffered metrics and blocks until everything queued so far has been posted.
+        if self._tx_thread is None:
+            return True
+        self._flush_metrics()
+        done = threading.Event()
+        self._tx_q.put(done)
+        return done.wait(timeout)
+
+    def _buffer_for_dashboard(self, payload: Dict):
+        if not self.dashboard_url:
+            return
+        self._metric_buf.append(payload)
+        if len(self._metric_buf) >= self.metrics_flush_size:
+            self._metric_flush_requested.set()
+
+    def _metric_flush_loop(self):
+        while not self._metric_flusher_stopped:
+            self._metric_flush_requested.wait(self.metrics_flush_interval_s)
+            self._metric_flush_requested.clear()
+            self._flush_metrics()
+
+    def _flush_metrics(self):
+        events = []
+        while True:
+            try:
+                events.append(self._metric_buf.popleft())
+            except IndexError:
+                break
+        for event in events:
+            self._send_to_dashboard(event)
+
     def _setup_otel(self):
         resource = Resource(attributes={
             "service.name": self.service_name,
             "service.version": self.service_version,
         })
-        provider = TracerProvider(resource=resource)
-        processor = SimpleSpanProcessor(ConsoleSpanExporter())
+        # Unsampled traces get non-recording spans, so attribute and event work on them is skipped.
+        provider = TracerProvider(resource=resource, sampler=ParentBased(TraceIdRatioBased(self.sampling_ratio)))
+        self._meter_provider = None
+        self._interaction_histogram = None
+        self._quality_gauge = None
+        if self.otlp_endpoint and OTLPSpanExporter is None:
+            logging.warning("👹 otlp_endpoint was set but opentelemetry-exporter-otlp-proto-http is not installed. Falling back to console export.")
+        if self.otlp_endpoint and OTLPSpanExporter is not None:
+            span_exporter = OTLPSpanExporter(endpoint=f"{self.otlp_endpoint}/v1/traces", compression=Compression.Gzip)
+            self._setup_otlp_metrics(resource)
+        else:
+            span_exporter = ConsoleSpanExporter()
+        processor = BatchSpanProcessor(
+            span_exporter,
+            max_queue_size=self.batch_max_queue,
+            max_export_batch_size=self.batch_size,
+            schedule_delay_millis=self.export_interval_ms,
+        )
         provider.add_span_processor(processor)
         trace.set_tracer_provider(provider)
-        logging.info(f"💮 OpenTelemetry initialized for service '{self.service_name}'.")
+        self._tracer_provider = provider
+        self._tracer = provider.get_tracer(self.service_name, self.service_version)
+        logging.info(f"💮 OpenTelemetry initialized for service '{self.service_name}' (sampling ratio {self.sampling_ratio}).")
+
+    def _setup_otlp_metrics(self, resource: Resource):
+        reader = PeriodicExportingMetricReader(
+            OTLPMetricExporter(endpoint=f"{self.otlp_endpoint}/v1/metrics", compression=Compression.Gzip),
+            export_interval_millis=self.export_interval_ms,
+        )
+        self._meter_provider = MeterProvider(resource=resource, metric_readers=[reader])
+        meter = self._meter_provider.get_meter(self.service_name, self.service_version)
+        self._interaction_histogram = meter.create_histogram(
+            "kansatsu.interaction.duration", unit="ms", description="End-to-end interaction time.")
+        self._quality_gauge = meter.create_gauge(
+            "kansatsu.quality.score", description="Most recent user quality score (1-5).")
 
     def get_tracer(self) -> trace.Tracer:
-        return trace.get_tracer(self.service_name, self.service_version)
+        return self._tracer
 
-    def log_metric(self, key: str, value: Any):
+    def _counters(self) -> collections.defaultdict:
+        shard = getattr(self._tls, "counters", None)
+        if shard is None:
+            shard = self._tls.counters = collections.defaultdict(int)
+            with self._lock:
+                self._counter_shards.append((weakref.ref(threading.current_thread()), shard))
+        return shard
+
+    @staticmethod
+    def _add_counts(metrics: Dict, counts: Dict, default_stats: Dict):
+        method_stats = metrics["method_stats"]
+        for key, value in counts.items():
+            if isinstance(key, tuple):
+                method_name, field = key
+                stats = method_stats.get(method_name)
+                if stats is None:
+                    stats = method_stats[method_name] = default_stats.copy()
+                stats[field] += value
+            else:
+                metrics[key] = metrics.get(key, 0) + value
+
+    def _snapshot_metrics(self) -> Dict:
         with self._lock:
-            if isinstance(self._metrics.get(key), list):
+            # A shard whose thread has exited never changes again, so it is added into the base
+            # metrics once and dropped; thread-per-request hosts would otherwise pile up shards.
+            live_shards = []
+            for thread_ref, shard in self._counter_shards:
+                thread = thread_ref()
+                if thread is not None and thread.is_alive():
+                    live_shards.append((thread_ref, shard))
+                else:
+                    self._add_counts(self._metrics, shard, self._default_stats_tpl)
+            self._counter_shards = live_shards
+            metrics = {k: (list(v) if isinstance(v, list) else v) for k, v in self._metrics.items()}
+            metrics["method_stats"] = {name: stats.copy() for name, stats in self._metrics["method_stats"].items()}
+        for _, shard in live_shards:
+            self._add_counts(metrics, dict(shard), self._default_stats_tpl)
+        return metrics
+
+    def log_metric(self, key: str, value: Any):
+        if isinstance(self._metrics.get(key), list):
+            with self._lock:
                 self._metrics[key].append(value)
-            else:
-                self._metrics[key] = self._metrics.get(key, 0) + value
+        else:
+            self._counters()[key] += value
 
     def log_quality_feedback(self, score: int):
         with self._lock:
-            self._metrics["quality_scores"].append(score)
-            self._send_to_dashboard({"type": "quality_feedback", "score": score})
+            self._metrics["quality_sum"] += score
+            self._metrics["quality_count"] += 1
+        if self._quality_gauge is not None:
+            self._quality_gauge.set(score)
+        self._buffer_for_dashboard({"type": "quality_feedback", "score": score})
 
     def log_interaction_time(self, duration_ms: float):
         with self._lock:
             self._metrics["interaction_count"] += 1
             self._metrics["total_interaction_time_ms"] += duration_ms
-            self._send_to_dashboard({"type": "interaction_time", "duration_ms": duration_ms})
+        if self._interaction_histogram is not None:
+            self._interaction_histogram.record(duration_ms)
+        self._buffer_for_dashboard({"type": "interaction_time", "duration_ms": duration_ms})
 
     def log_method_performance(self, method_name: str, duration_ms: float):
-        with self._lock:
-            self._metrics["total_calls"] += 1
-            if method_name not in self._metrics["method_stats"]:
-                self._metrics["method_stats"][method_name] = self._get_default_method_stats()
-            stats = self._metrics["method_stats"][method_name]
-            stats["calls"] += 1
-            stats["total_duration_ms"] += duration_ms
-            self._send_to_dashboard({"type": "method_performance", "name": method_name, "duration_ms": duration_ms})
+        counters = self._counters()
+        counters["total_calls"] += 1
+        counters[(method_name, "calls")] += 1
+        counters[(method_name, "total_duration_ms")] += duration_ms
+        self._send_to_dashboard({"type": "method_performance", "name": method_name, "duration_ms": duration_ms})
 
     def log_method_llm_usage(self, method_name: str, prompt_tokens: int, completion_tokens: int, total_tokens: int):
-        with self._lock:
-            if method_name not in self._metrics["method_stats"]:
-                self._metrics["method_stats"][method_name] = self._get_default_method_stats()
-            stats = self._metrics["method_stats"][method_name]
-            stats["prompt_tokens"] += prompt_tokens
-            stats["completion_tokens"] += completion_tokens
-            stats["total_tokens"] += total_tokens
-            self._metrics["llm_total_prompt_tokens"] += prompt_tokens
-            self._metrics["llm_total_completion_tokens"] += completion_tokens
-            self._metrics["llm_total_tokens"] += total_tokens
-            self._send_to_dashboard({
-                "type": "method_llm_usage",
-                "name": method_name,
-                "tokens": {
-                    "prompt": prompt_tokens,
-                    "completion": completion_tokens,
-                    "total": total_tokens,
-                }
-            })
+        counters = self._counters()
+        counters[(method_name, "prompt_tokens")] += prompt_tokens
+        counters[(method_name, "completion_tokens")] += completion_tokens
+        counters[(method_name, "total_tokens")] += total_tokens
+        counters["llm_total_prompt_tokens"] += prompt_tokens
+        counters["llm_total_completion_tokens"] += completion_tokens
+        counters["llm_total_tokens"] += total_tokens
+        self._send_to_dashboard({
+            "type": "method_llm_usage",
+            "name": method_name,
+            "tokens": {
+                "prompt": prompt_tokens,
+                "completion": completion_tokens,
+                "total": total_tokens,
+            }
+        })
 
     def _get_default_method_stats(self) -> Dict:
         return {
@@ -145,41 +587,45 @@ class Kansatsu:
         }
 
     def print_summary(self):
+        metrics = self._snapshot_metrics()
         print("\n" + "💮" * 35)
         print(" " * 27 + "Observability Summary")
         print("💮" * 35)
         print("\n--- 💹 General Stats ---")
-        print(f"・Total Monitored Calls: {self._metrics['total_calls']}")
-        print(f"・Total Errors: {self._metrics['errors']}")
-        interaction_count = self._metrics.get("interaction_count", 0)
+        print(f"・Total Monitored Calls: {metrics['total_calls']}")
+        print(f"・Total Errors: {metrics['errors']}")
+        interaction_count = metrics.get("interaction_count", 0)
         if interaction_count > 0:
-            total_interaction_time = self._metrics['total_interaction_time_ms']
+            total_interaction_time = metrics['total_interaction_time_ms']
             avg_interaction_time = total_interaction_time / interaction_count
             print(f"・Average End-to-End Interaction Time: {avg_interaction_time:.2f} ms (from {interaction_count} interactions)")
         else:
             print("・Average End-to-End Interaction Time: No full interactions completed.")
         print("\n--- [┐∵]┘ LLM Usage ---")
-        print(f"・Prompt Tokens: {self._metrics['llm_total_prompt_tokens']}")
-        print(f"・Completion Tokens: {self._metrics['llm_total_completion_tokens']}")
-        print(f"・Total Tokens: {self._metrics['llm_total_tokens']}")
+        print(f"・Prompt Tokens: {metrics['llm_total_prompt_tokens']}")
+        print(f"・Completion Tokens: {metrics['llm_total_completion_tokens']}")
+        print(f"・Total Tokens: {metrics['llm_total_tokens']}")
+        cache_lookups = metrics['llm_cache_hits'] + metrics['llm_cache_misses']
+        if cache_lookups > 0:
+            print(f"・Semantic Cache Hits: {metrics['llm_cache_hits']} / {cache_lookups} lookups")
         print("\n--- 📜 Quality & Responsible AI ---")
-        quality_scores = self._metrics.get("quality_scores", [])
-        if quality_scores:
-            avg_score = sum(quality_scores) / len(quality_scores)
-            print(f"・Average User Quality Score: {avg_score:.2f} / 5.0 (from {len(quality_scores)} ratings)")
+        quality_count = metrics["quality_count"]
+        if quality_count > 0:
+            avg_score = metrics["quality_sum"] / quality_count
+            print(f"・Average User Quality Score: {avg_score:.2f} / 5.0 (from {quality_count} ratings)")
         else:
             print("・Average User Quality Score: No ratings provided.")
-        rai_alerts = self._metrics.get("rai_alerts", [])
+        rai_alerts = metrics.get("rai_alerts", [])
         print(f"・Responsible AI Alerts Found: {len(rai_alerts)}")
         if rai_alerts:
             for i, alert in enumerate(rai_alerts):
                 print(f"    {i+1}. Type: {alert['type']}, Details: {alert['details']}")
         print("\n--- 🕒 Method Performance Summary (Sorted by Total Time) ---")
-        method_stats = self._metrics.get("method_stats", {})
+        method_stats = metrics.get("method_stats", {})
         if not method_stats:
             print("No methods were monitored.")
         else:
-            sorted_stats = sorted(method_stats.items(), key=lambda item: item[1]['total_duration_ms'], reverse=True)
+            sorted_stats = heapq.nlargest(_SUMMARY_TOP_METHODS, method_stats.items(), key=lambda item: item[1]['total_duration_ms'])
             print(f"{'Method Name':<30} | {'Calls':>5} | {'Avg Time':>12} | {'Total Tokens':>12} | {'Avg Tokens':>12}")
             print("-" * 82)
             for method_name, data in sorted_stats:
@@ -188,163 +634,335 @@ class Kansatsu:
                 total_tokens = data['total_tokens']
                 avg_tokens = total_tokens / calls if calls > 0 else 0
                 print(f"{method_name:<30} | {calls:>5} | {avg_duration:>10.2f} ms | {total_tokens:>12} | {avg_tokens:>12.0f}")
+            if len(method_stats) > len(sorted_stats):
+                print(f"... and {len(method_stats) - len(sorted_stats)} more methods.")
         print("💮" * 35 + "\n")
 
+    def _record_call_input(self, span: trace.Span, func: Callable, args: tuple, kwargs: dict):
+        if not span.is_recording():
+            return
+        if _LOG_IO_ENABLED:
+            try:
+                func_args = {k: v for k, v in kwargs.items()}
+                if args:
+                    func_args['args'] = args[1:] if 'self' in func.__qualname__ else args
+                span.add_event("function_input", {"input": orjson.dumps(_clip_for_log(func_args), default=str).decode()[:_LOG_IO_MAX_CHARS]})
+            except Exception:
+                span.add_event("function_input", {"input": "Could not serialize input."})
+        else:
+            span.set_attribute("function.arg_count", len(args) + len(kwargs))
+
+    def _record_call_result(self, span: trace.Span, span_name: str, result: Any, track_tokens: bool, log_io: bool):
+        try:
+            span.set_status(Status(StatusCode.OK))
+            if track_tokens:
+                adapter = _USAGE_ADAPTERS.get(type(result)) or _resolve_usage_adapter(result)
+                try:
+                    prompt_tokens, completion_tokens, total_tokens = adapter(result)
+                    has_tokens = total_tokens > 0
+                except (AttributeError, TypeError):
+                    # This result doesn't have the shape cached for its type (e.g. usage=None).
+                    prompt_tokens, completion_tokens, total_tokens = _no_usage(result)
+                    has_tokens = False
+                if has_tokens:
+                    self.log_method_llm_usage(span_name, prompt_tokens, completion_tokens, total_tokens)
+                    span.set_attributes({
+                        "llm.usage.prompt_tokens": prompt_tokens,
+                        "llm.usage.completion_tokens": completion_tokens,
+                        "llm.usage.total_tokens": total_tokens,
+                    })
+            if log_io and span.is_recording():
+                if _LOG_IO_ENABLED:
+                    output_text = result.text if hasattr(result, 'text') else str(_clip_for_log(result))
+                    span.add_event("function_output", {"output": output_text[:_LOG_IO_MAX_CHARS]})
+                else:
+                    span.set_attribute("function.result_type", type(result).__name__)
+                    if hasattr(result, '__len__'):
+                        span.set_attribute("function.result_size", len(result))
+        except Exception:
+            # Telemetry must never fail the monitored call or be counted as its error.
+            logging.warning(f"👹 Could not record the result of '{span_name}'", exc_info=True)
+
+    def _record_call_error(self, span: trace.Span, span_name: str, e: Exception):
+        self.log_metric("errors", 1)
+        self._send_to_dashboard({"type": "error"})
+        logging.error(f"👹 Error in '{span_name}': {e}", exc_info=True)
+        span.record_exception(e)
+        span.set_status(Status(StatusCode.ERROR, f"Exception: {e}"))
+        span.set_attribute("error.type", type(e).__name__)
+
+    def _record_call_duration(self, span: trace.Span, span_name: str, start_time: float):
+        duration_ms = (time.perf_counter() - start_time) * 1000
+        self.log_method_performance(span_name, duration_ms)
+        span.set_attribute("duration.ms", duration_ms)
+        logging.info("🕒 '%s' finished in %.2f ms.", span_name, duration_ms)
+
     def monitor(self, span_name: str = None, track_tokens: bool = False, log_io: bool = False):
         def decorator(func: Callable) -> Callable:
+            _span_name = span_name or func.__name__
+
+            # Coroutines get their own wrapper so the span covers the awaited work; the OTel
+            # context lives in a contextvar and so follows the coroutine across awaits.
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs) -> Any:
+                    with self._tracer.start_as_current_span(_span_name) as span:
+                        start_time = time.perf_counter()
+                        if log_io:
+                            self._record_call_input(span, func, args, kwargs)
+                        try:
+                            result = await func(*args, **kwargs)
+                            self._record_call_result(span, _span_name, result, track_tokens, log_io)
+                            return result
+                        except Exception as e:
+                            self._record_call_error(span, _span_name, e)
+                            raise
+                        finally:
+                            self._record_call_duration(span, _span_name, start_time)
+                return async_wrapper
+
             @functools.wraps(func)
             def wrapper(*args, **kwargs) -> Any:
-                _span_name = span_name or func.__name__
-                tracer = self.get_tracer()
-                with tracer.start_as_current_span(_span_name) as span:
+                with self._tracer.start_as_current_span(_span_name) as span:
                     start_time = time.perf_counter()
                     if log_io:
-                        try:
-                            func_args = {k: v for k, v in kwargs.items()}
-                            if args:
-                                func_args['args'] = args[1:] if 'self' in func.__qualname__ else args
-                            span.add_event("function_input", {"input": json.dumps(func_args, default=str)[:1000]})
-                        except Exception:
-                            span.add_event("function_input", {"input": "Could not serialize input."})
+                        self._record_call_input(span, func, args, kwargs)
                     try:
                         result = func(*args, **kwargs)
-                        span.set_status(Status(StatusCode.OK))
-                        if track_tokens:
-                            prompt_tokens, completion_tokens, total_tokens = 0, 0, 0
-                            if hasattr(result, 'usage_metadata'):
-                                usage = result.usage_metadata
-                                prompt_tokens = usage.prompt_token_count
-                                completion_tokens = usage.candidates_token_count
-                                total_tokens = usage.total_token_count
-                            elif hasattr(result, 'usage') and hasattr(result.usage, 'prompt_tokens'):
-                                usage = result.usage
-                                prompt_tokens = usage.prompt_tokens
-                                completion_tokens = usage.completion_tokens
-                                total_tokens = usage.total_tokens
-                            elif hasattr(result, 'usage') and hasattr(result.usage, 'input_tokens'):
-                                usage = result.usage
-                                prompt_tokens = usage.input_tokens
-                                completion_tokens = usage.output_tokens
-                                total_tokens = prompt_tokens + completion_tokens
-                            
-                            # Responses API (gpt-4o-mini via client.responses.create)
-                            elif hasattr(result, 'usage_metadata'):
-                                usage = result.usage_metadata
-                                prompt_tokens = getattr(usage, "prompt_token_count", 0)
-                                completion_tokens = getattr(usage, "candidates_token_count", 0)
-                                total_tokens = getattr(usage, "total_token_count", 0)
-                        
-                            # Chat/Completion API (legacy)
-                            elif hasattr(result, 'usage'):
-                                usage = result.usage
-                                prompt_tokens = getattr(usage, "prompt_tokens", 0)
-                                completion_tokens = getattr(usage, "completion_tokens", 0)
-                                total_tokens = getattr(usage, "total_tokens", prompt_tokens + completion_tokens)
-                                
-                            if total_tokens > 0:
-                                self.log_method_llm_usage(_span_name, prompt_tokens, completion_tokens, total_tokens)
-                                span.set_attributes({
-                                    "llm.usage.prompt_tokens": prompt_tokens,
-                                    "llm.usage.completion_tokens": completion_tokens,
-                                    "llm.usage.total_tokens": total_tokens,
-                                })
-                        if log_io:
-                            output_text = result.text if hasattr(result, 'text') else str(result)
-                            span.add_event("function_output", {"output": output_text[:1000]})
+                        self._record_call_result(span, _span_name, result, track_tokens, log_io)
                         return result
                     except Exception as e:
-                        self.log_metric("errors", 1)
-                        self._send_to_dashboard({"type": "error"})
-                        logging.error(f"👹 Error in '{_span_name}': {e}", exc_info=True)
-                        span.record_exception(e)
-                        span.set_status(Status(StatusCode.ERROR, f"Exception: {e}"))
-                        span.set_attribute("error.type", type(e).__name__)
+                        self._record_call_error(span, _span_name, e)
                         raise
                     finally:
-                        duration_ms = (time.perf_counter() - start_time) * 1000
-                        self.log_method_performance(_span_name, duration_ms)
-                        span.set_attribute("duration.ms", duration_ms)
-                        logging.info(f"🕒 '{_span_name}' finished in {duration_ms:.2f} ms.")
+                        self._record_call_duration(span, _span_name, start_time)
             return wrapper
         return decorator
 
+    def cache_llm(self, cache: SemanticCache, key_text: str, fn: Callable, *args, **kwargs) -> Any:
+        span = trace.get_current_span()
+        key = cache.make_key(key_text)
+        hit, value = cache.get(key)
+        self.log_metric("llm_cache_hits" if hit else "llm_cache_misses", 1)
+        span.set_attribute("llm.cache.hit", hit)
+        self._send_to_dashboard({"type": "llm_cache", "hit": hit})
+        if hit:
+            return value
+        value = fn(*args, **kwargs)
+        if value is not None:
+            cache.put(key, value)
+        return value
+
     def log_rai_alert(self, alert_type: str, details: str):
         alert_data = {"type": alert_type, "details": details}
         with self._lock:
             self._metrics["rai_alerts"].append(alert_data)
         self._send_to_dashboard({"type": "rai_alert", "alert": alert_data})
 
-    def check_responsible_ai(self, text: str, span: trace.Span) -> Dict:
+    def log_rai_alerts(self, alerts: List[Dict]):
+        # Records several alerts with one lock acquisition and a single dashboard event.
+        if not alerts:
+            return
+        with self._lock:
+            self._metrics["rai_alerts"].extend(alerts)
+        self._send_to_dashboard({"type": "rai_alerts", "alerts": alerts})
+
+    def _match_pii_types(self, text: str) -> Optional[Set[str]]:
+        # The prefilter's \w, \s and \b are ASCII-only, and its \s misses a few ASCII characters
+        # that `re` counts as whitespace, so it is only trusted for ASCII text without those.
+        if self._pii_set is None or not text.isascii() or _PREFILTER_UNSAFE_RE.search(text):
+            return None
+        return {self._pii_set_labels[i] for i in (self._pii_set.Match(text) or ())}
+
+    def _scan_regex(self, text: str):
         findings = []
-        claimed_indices = set()
-        complex_regex_patterns = {
-            "CREDIT_CARD": re.compile(r'\b(?:credit card|card|cc)[\s\w:;#-]*?((?:\d[ -]*?){13,16})\b', re.IGNORECASE),
-            "MRN": re.compile(r'\b(mrn|medical record|patient id|medical number|medical id)[\s\w:;#-]*?(\w[\w-]*\w)\b', re.IGNORECASE),
-            "DATE_OF_BIRTH": re.compile(r'\b(dob|date of birth|birthday|birth date)[\s\w:;#-]*?(\d{1,2}[-/]\d{1,2}[-/]\d{2,4}|\b(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s\d{1,2},?\s\d{2,4})\b', re.IGNORECASE),
-        }
-        for pii_type, pattern in complex_regex_patterns.items():
-            for match in pattern.finditer(text):
+        # One byte per character of text; a non-zero byte marks it as covered by a regex match.
+        claimed = bytearray(len(text))
+        candidate_types = self._match_pii_types(text)
+        for pii_type, regex in _COMPLEX_PII_REGEXES:
+            if candidate_types is not None and pii_type not in candidate_types:
+                continue
+            for match in regex.finditer(text):
                 start, end = match.span()
                 if pii_type == "CREDIT_CARD":
                     card_number_part = match.group(1)
-                    cleaned_number = re.sub(r'[\s-]', '', card_number_part)
+                    cleaned_number = _CARD_STRIP_RE.sub('', card_number_part)
                     if not is_luhn_valid(cleaned_number):
-                        for i in range(start, end):
-                            claimed_indices.add(i)
-                        logging.info(f"Found a credit-card-like pattern but it failed Luhn check. Blocking indices for spaCy.")
+                        claimed[start:end] = b'\x01' * (end - start)
+                        logging.info("Found a credit-card-like pattern but it failed Luhn check. Blocking indices for spaCy.")
                         continue
-                for i in range(start, end):
-                    claimed_indices.add(i)
+                claimed[start:end] = b'\x01' * (end - start)
                 redacted_text = f"[{pii_type}_REDACTED]"
-                finding_details = {"type": pii_type, "details": f"Found pattern matching '{match.group(0)}' at index {match.start()}"}
-                findings.append(finding_details)
-                self.log_rai_alert(alert_type=pii_type, details=f"Found at index {match.start()}")
-                span.add_event("rai_alert", {"type": pii_type, "match_text": redacted_text})
-
-        simple_regex_patterns = {
-            "SSN": re.compile(r'\b\d{3}[-]\d{2}[-]\d{4}\b'),
-            "EMAIL": re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'),
-            "PHONE_NUMBER_US": re.compile(r'\b\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b'),
-        }
-        for pii_type, pattern in simple_regex_patterns.items():
-            for match in pattern.finditer(text):
+                details = f"Found pattern matching '{match.group(0)}' at index {match.start()}"
+                findings.append((pii_type, details, match.start(), (("type", pii_type), ("match_text", redacted_text))))
+
+        for pii_type, regex in _SIMPLE_PII_REGEXES:
+            if candidate_types is not None and pii_type not in candidate_types:
+                continue
+            for match in regex.finditer(text):
                 start, end = match.span()
-                if any(i in claimed_indices for i in range(start, end)):
+                if claimed.find(1, start, end) != -1:
                     continue
-                for i in range(start, end):
-                    claimed_indices.add(i)
+                claimed[start:end] = b'\x01' * (end - start)
                 redacted_text = f"[{pii_type}_REDACTED]"
-                finding_details = {"type": pii_type, "details": f"Found pattern matching '{match.group(0)}' at index {match.start()}"}
-                findings.append(finding_details)
-                self.log_rai_alert(alert_type=pii_type, details=f"Found at index {match.start()}")
-                span.add_event("rai_alert", {"type": pii_type, "match_text": redacted_text})
-
-        if self.nlp:
-            doc = self.nlp(text)
-            spacy_to_pii_map = {"PERSON": "PERSON_NAME", "GPE": "LOCATION", "LOC": "LOCATION", "DATE": "DATE_ENTITY", "ORG": "ORGANIZATION"}
-            for ent in doc.ents:
-                is_claimed = any(i in claimed_indices for i in range(ent.start_char, ent.end_char))
-                if is_claimed:
-                    logging.info(f"spaCy entity '{ent.text}' ({ent.label_}) overlaps with a high-precision match. Discarding.")
-                    continue
-                pii_type = spacy_to_pii_map.get(ent.label_)
-                if pii_type:
-                    redacted_text = f"[{pii_type}_REDACTED]"
-                    finding_details = {"type": pii_type, "details": f"Found '{ent.text}' (redacted as {redacted_text}) at index {ent.start_char}"}
-                    findings.append(finding_details)
-                    self.log_rai_alert(alert_type=pii_type, details=f"Found at index {ent.start_char}")
-                    span.add_event("rai_alert", {"type": pii_type, "original_text": ent.text})
-
-        pii_found = len(findings) > 0
-        span.set_attribute("rai.pii_found", pii_found)
-        span.set_attribute("rai.findings_count", len(findings))
+                details = f"Found pattern matching '{match.group(0)}' at index {match.start()}"
+                findings.append((pii_type, details, match.start(), (("type", pii_type), ("match_text", redacted_text))))
+        return findings, claimed
+
+    def _needs_ner(self, text: str, claimed: bytearray) -> bool:
+        # Names, places and organisations are practically always capitalised, so all-lowercase
+        # text without digits skips NER. Only relative dates such as "last week" are given up.
+        if text.lower() == text and not _DIGIT_RE.search(text):
+            return False
+        # Any entity spaCy finds inside claimed text is discarded anyway, so skip the model when
+        # the regex matches already cover nearly all of the text.
+        non_space = len("".join(text.split()))
+        if claimed.count(1) >= _NER_SKIP_COVERAGE * non_space:
+            covered = sum(1 for c, is_claimed in zip(text, claimed) if is_claimed and not c.isspace())
+            if covered >= _NER_SKIP_COVERAGE * non_space:
+                return False
+        # Only now is the model worth loading.
+        return bool(self.nlp)
+
+    def _add_ner_findings(self, doc, claimed: bytearray, findings: list):
+        for ent in doc.ents:
+            if ent.label_ not in _SPACY_LABELS:
+                continue
+            is_claimed = claimed.find(1, ent.start_char, ent.end_char) != -1
+            if is_claimed:
+                logging.info("spaCy entity '%s' (%s) overlaps with a high-precision match. Discarding.", ent.text, ent.label_)
+                continue
+            pii_type = _SPACY_TO_PII[ent.label_]
+            redacted_text = f"[{pii_type}_REDACTED]"
+            details = f"Found '{ent.text}' (redacted as {redacted_text}) at index {ent.start_char}"
+            findings.append((pii_type, details, ent.start_char, (("type", pii_type), ("original_text", ent.text))))
+
+    def _scan_pii(self, text: str) -> tuple:
+        # Pure detection: returns (pii_type, details, index, event_attributes) tuples and leaves
+        # alerting to the caller, so the result can be cached and replayed for repeated text.
+        findings, claimed = self._scan_regex(text)
+        if self._needs_ner(text, claimed):
+            self._add_ner_findings(self.nlp(text), claimed, findings)
+        return tuple(findings)
+
+    def _scan_pii_many(self, texts: List[str]) -> List[tuple]:
+        # Same as _scan_pii for each text, but the texts that need NER go through nlp.pipe together.
+        scanned = [self._scan_regex(text) for text in texts]
+        ner_indices = [i for i, (text, (_, claimed)) in enumerate(zip(texts, scanned)) if self._needs_ner(text, claimed)]
+        if ner_indices:
+            docs = self.nlp.pipe((texts[i] for i in ner_indices), batch_size=_NER_BATCH_SIZE)
+            for i, doc in zip(ner_indices, docs):
+                findings, claimed = scanned[i]
+                self._add_ner_findings(doc, claimed, findings)
+        return [tuple(findings) for findings, _ in scanned]
+
+    def _rai_cache_key(self, text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=8).digest()
+
+    def _store_scan(self, key: bytes, scanned: tuple):
+        with self._rai_cache_lock:
+            self._rai_cache[key] = scanned
+            if len(self._rai_cache) > _RAI_CACHE_SIZE:
+                self._rai_cache.popitem(last=False)
+
+    def _lookup_scan(self, key: bytes) -> Optional[tuple]:
+        with self._rai_cache_lock:
+            cached = self._rai_cache.get(key)
+            if cached is not None:
+                self._rai_cache.move_to_end(key)
+            return cached
+
+    def _scan_pii_cached(self, text: str) -> tuple:
+        key = self._rai_cache_key(text)
+        cached = self._lookup_scan(key)
+        if cached is not None:
+            return cached
+        scanned = self._scan_pii(text)
+        self._store_scan(key, scanned)
+        return scanned
+
+    def _report_findings(self, scanned: tuple, span: trace.Span) -> Dict:
+        findings = []
+        alerts = []
+        for pii_type, details, index, event_attributes in scanned:
+            findings.append({"type": pii_type, "details": details})
+            alerts.append({"type": pii_type, "details": f"Found at index {index}"})
+            span.add_event("rai_alert", dict(event_attributes))
+        self.log_rai_alerts(alerts)
         return {
-            "pii_found": pii_found,
+            "pii_found": len(findings) > 0,
             "findings_count": len(findings),
             "findings": findings
         }
 
+    def check_responsible_ai(self, text: str, span: trace.Span) -> Dict:
+        result = self._report_findings(self._scan_pii_cached(text), span)
+        span.set_attribute("rai.pii_found", result["pii_found"])
+        span.set_attribute("rai.findings_count", result["findings_count"])
+        return result
+
+    def check_responsible_ai_batch(self, texts: List[str], span: trace.Span) -> List[Dict]:
+        keys = [self._rai_cache_key(text) for text in texts]
+        scanned = [self._lookup_scan(key) for key in keys]
+        misses = [i for i, cached in enumerate(scanned) if cached is None]
+        for i, result in zip(misses, self._scan_pii_many([texts[i] for i in misses])):
+            scanned[i] = result
+            self._store_scan(keys[i], result)
+
+        results = [self._report_findings(result, span) for result in scanned]
+        span.set_attribute("rai.pii_found", any(r["pii_found"] for r in results))
+        span.set_attribute("rai.findings_count", sum(r["findings_count"] for r in results))
+        return results
+
+    def responsible_ai_stream(self, span: trace.Span) -> "_ResponsibleAIStream":
+        return _ResponsibleAIStream(self, span)
+
     def shutdown(self):
         logging.info("Shutting down observability and notifying dashboard.")
+        self._metric_flusher_stopped = True
+        self._metric_flush_requested.set()
+        # The flusher may be mid-flush; let it finish so none of its events land after session_end.
+        if self._metric_flusher is not None:
+            self._metric_flusher.join(timeout=5.0)
+        self._flush_metrics()
         self._send_to_dashboard({"type": "session_end"})
+        if self._tx_thread is not None:
+            self._tx_q.put(_TX_STOP)
+            self._tx_thread.join(timeout=5.0)
+            # Nothing reads the queue any more, so a later flush() must not wait on it.
+            self._tx_thread = None
+        self._tracer_provider.shutdown()
+        if self._meter_provider is not None:
+            self._meter_provider.shutdown()
         self.print_summary()
+
+
+class _ResponsibleAIStream:
+    # Incremental counterpart of check_responsible_ai for streamed LLM output: each chunk is run
+    # through the PII prefilter as it arrives so `rai.pii_found` is set on the span as soon as a
+    # pattern shows up, and finish() runs the full check on the assembled text.
+    def __init__(self, agent: Kansatsu, span: trace.Span):
+        self._agent = agent
+        self._span = span
+        self._chunks: List[str] = []
+        self._tail = ""
+        self.flagged = False
+
+    def feed(self, chunk: str):
+        if not chunk:
+            return
+        self._chunks.append(chunk)
+        if self.flagged:
+            return
+        window = self._tail + chunk
+        self._tail = window[-_RAI_STREAM_OVERLAP:]
+        if self._agent._match_pii_types(window):
+            self.flagged = True
+            self._span.set_attribute("rai.pii_found", True)
+
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def finish(self) -> Dict:
+        # The prefilter skips Luhn and spaCy, so the full check still decides the final result.
+        return self._agent.check_responsible_ai(self.text(), self._span)
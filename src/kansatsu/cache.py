@@ -0,0 +1,70 @@
+# FILE: src/kansatsu/cache.py
+
+import copy
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Caches LLM results keyed by the embedding of the text that produced them, so that
+    paraphrased queries (cosine similarity >= threshold) reuse an earlier result.
+
+    `embed_fn` maps a string to a vector (e.g. an OpenAI or Vertex AI embedding call).
+    `partition_fn`, if given, maps a string to a hashable key and only entries with the
+    same key are compared, which keeps e.g. "circle radius 10" and "circle radius 12"
+    from sharing a result.
+    """
+
+    def __init__(self, embed_fn: Callable[[str], Sequence[float]], threshold: float = 0.9,
+                 max_entries: int = 512, partition_fn: Optional[Callable[[str], Hashable]] = None):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.partition_fn = partition_fn
+        self._entries: Dict[Hashable, List[Tuple[np.ndarray, Any]]] = {}
+        self._matrices: Dict[Hashable, np.ndarray] = {}
+        self._insertion_order = deque()
+        self._lock = threading.Lock()
+
+    def make_key(self, text: str) -> Tuple[Hashable, np.ndarray]:
+        partition = self.partition_fn(text) if self.partition_fn else None
+        vector = np.asarray(self.embed_fn(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+        return partition, vector
+
+    def get(self, key: Tuple[Hashable, np.ndarray]) -> Tuple[bool, Any]:
+        partition, vector = key
+        with self._lock:
+            entries = self._entries.get(partition)
+            if not entries:
+                return False, None
+            matrix = self._matrices.get(partition)
+            if matrix is None:
+                matrix = self._matrices[partition] = np.stack([v for v, _ in entries])
+            similarities = matrix @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return False, None
+            return True, copy.deepcopy(entries[best][1])
+
+    def put(self, key: Tuple[Hashable, np.ndarray], value: Any):
+        partition, vector = key
+        with self._lock:
+            self._entries.setdefault(partition, []).append((vector, copy.deepcopy(value)))
+            self._matrices.pop(partition, None)
+            self._insertion_order.append(partition)
+            while len(self._insertion_order) > self.max_entries:
+                oldest = self._insertion_order.popleft()
+                self._entries[oldest].pop(0)
+                self._matrices.pop(oldest, None)
+                if not self._entries[oldest]:
+                    del self._entries[oldest]
+
+    def __len__(self) -> int:
+        return len(self._insertion_order)
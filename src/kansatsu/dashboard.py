@@ -2,83 +2,312 @@
 
 import dash
 from dash import dcc, html, dash_table, Input, Output, State
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 import plotly.graph_objects as go
-from flask import Flask, request, jsonify
+import plotly.io as pio
+from plotly.subplots import make_subplots
+from flask import Flask, Response, abort, request
+from flask.json.provider import JSONProvider
 import threading
+import heapq
+import itertools
+from collections import deque
 import time
 import pandas as pd
-from collections import deque
-from datetime import datetime
+import numpy as np
 import argparse
+import orjson
 import logging
 import sys
 from . import __version__
 
-data_lock = threading.Lock()
-MAX_GRAPH_POINTS = 30
+try:
+    from tsdownsample import MinMaxLTTBDownsampler
+except ImportError:
+    MinMaxLTTBDownsampler = None
+
+try:
+    import waitress
+except ImportError:
+    waitress = None
+
+try:
+    from flask_compress import Compress
+except ImportError:
+    Compress = None
+
+MAX_GRAPH_POINTS = 10_000
+MAX_PLOTTED_POINTS = 500
+# A page's traces grow by extendData up to this many points, then the figure is rebuilt from a fresh downsample.
+MAX_EXTENDED_POINTS = 2 * MAX_PLOTTED_POINTS
+MAX_TABLE_ROWS = 50
+MAX_RAI_ALERTS = 1000
+
+class AtomicCounter:
+    # An int behind its own tiny lock, so bumping a counter never waits on a section lock and
+    # reads have no side effects.
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def increment(self):
+        with self._lock:
+            self._value += 1
+
+    @property
+    def value(self):
+        with self._lock:
+            return self._value
+
+class MethodStat:
+    # One method's totals. Slotted so the /update hot path uses attribute access, not dict probes.
+    __slots__ = ("calls", "avg_duration_ms", "total_tokens")
+
+    def __init__(self):
+        self.calls = 0
+        self.avg_duration_ms = 0.0
+        self.total_tokens = 0
+
 app_data = {
-    "general_stats": {"total_calls": 0, "errors": 0, "interaction_count": 0, "total_interaction_time_ms": 0.0},
-    "llm_usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
-    "quality_rai": {"quality_scores": [], "rai_alerts": []},
+    "general_stats": {"total_calls": AtomicCounter(), "errors": AtomicCounter(), "interaction_count": AtomicCounter(), "total_interaction_time_ms": 0.0},
+    "llm_usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cache_hits": 0, "cache_lookups": 0},
+    # rai_alerts keeps only the latest MAX_RAI_ALERTS; rai_alert_count counts every alert received.
+    "quality_rai": {"quality_sum": 0, "quality_count": 0, "rai_alerts": deque(maxlen=MAX_RAI_ALERTS), "rai_alert_count": 0},
     "method_details": {},
     "live_graphs": {},
-    "session_ended": False,
 }
+# Set once the agent reports session_end; callbacks check it without taking any lock.
+session_ended = threading.Event()
+# Each section of app_data has its own lock (general_stats' only covers the float sum), so updates
+# to unrelated sections never queue behind each other. The method_details/live_graphs locks only
+# cover adding a method; a method's own entries are guarded by its lock in method_locks, so calls
+# to different methods don't contend.
+section_locks = {section: threading.Lock() for section in ("general_stats", "llm_usage", "quality_rai", "method_details", "live_graphs")}
+# Bumped after every change to a section, so each callback can skip ticks where its section is unchanged.
+# RAI alerts get their own version so quality feedback doesn't re-render the alert list.
+section_versions = {section: AtomicCounter() for section in (*section_locks, "rai_alerts")}
+final_table_cache = {"version": None, "children": None}
+final_table_lock = threading.Lock()
+# The alert list only ever grows, so items are built once per alert and shared by every page.
+rai_alert_cache = {"seen": 0, "items": deque(maxlen=MAX_RAI_ALERTS)}
+rai_alert_cache_lock = threading.Lock()
+method_locks = {}
+
+class OrjsonProvider(JSONProvider):
+    # Flask's JSON (including Dash's own jsonify calls) through orjson, which also takes numpy values.
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+# Dash encodes callback outputs (figures included) with plotly's JSON engine.
+pio.json.config.default_engine = "orjson"
+UPDATE_OK = orjson.dumps({"success": True})
 
 server = Flask(__name__)
+server.json = OrjsonProvider(server)
+if Compress is not None:
+    # Figure JSON is repetitive and shrinks several times over; brotli when the browser accepts it.
+    server.config['COMPRESS_MIMETYPES'] = ['application/json']
+    server.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+    Compress(server)
 app = dash.Dash(__name__, server=server, external_stylesheets=[dbc.themes.DARKLY])
 log = logging.getLogger('werkzeug')
 log.setLevel(logging.ERROR) # Suppress noisy Flask logs
 
 def get_default_live_graph_data():
+    # Points live in fixed-size numpy ring buffers; point number i is stored at i % MAX_GRAPH_POINTS.
+    # Every point is a single call, so only its time and token count are stored.
+    # `appended` counts every point ever added; each page keeps its own count of how many it has
+    # been sent and how many it plots (the live-graph-sent store), so each tick only ships the
+    # points in between via extendData.
     return {
-        'timestamps': deque(maxlen=MAX_GRAPH_POINTS),
-        'calls': deque(maxlen=MAX_GRAPH_POINTS),
-        'tokens': deque(maxlen=MAX_GRAPH_POINTS),
+        'timestamps': np.empty(MAX_GRAPH_POINTS, dtype=np.int64),
+        'tokens': np.zeros(MAX_GRAPH_POINTS, dtype=np.int64),
+        'pending_tokens': 0,
+        'appended': 0,
     }
 
-@server.route('/update', methods=['POST'])
-def update_data():
-    payload = request.json
-    with data_lock:
-        update_type = payload.get("type")
-        if update_type == "method_performance":
-            name = payload["name"]
-            duration = payload["duration_ms"]
-            if name not in app_data["method_details"]:
-                app_data["method_details"][name] = {"calls": 0, "total_duration_ms": 0.0, "total_tokens": 0}
-            if name not in app_data["live_graphs"]:
-                app_data["live_graphs"][name] = get_default_live_graph_data()
-            app_data["method_details"][name]["calls"] += 1
-            app_data["method_details"][name]["total_duration_ms"] += duration
-            app_data["general_stats"]["total_calls"] += 1
-            app_data["live_graphs"][name]['timestamps'].append(datetime.now())
-            app_data["live_graphs"][name]['calls'].append(1)
-            app_data["live_graphs"][name]['tokens'].append(0)
-        elif update_type == "method_llm_usage":
-            name = payload["name"]
-            tokens = payload["tokens"]
-            if name not in app_data["method_details"]:
-                app_data["method_details"][name] = {"calls": 0, "total_duration_ms": 0.0, "total_tokens": 0}
-            app_data["method_details"][name]["total_tokens"] += tokens["total"]
+def get_method_lock(name):
+    lock = method_locks.get(name)
+    if lock is None:
+        with section_locks["method_details"]:
+            lock = method_locks.setdefault(name, threading.Lock())
+    return lock
+
+def get_method_details(name):
+    details = app_data["method_details"].get(name)
+    if details is None:
+        with section_locks["method_details"]:
+            details = app_data["method_details"].setdefault(name, MethodStat())
+    return details
+
+def get_live_graph(name):
+    graph = app_data["live_graphs"].get(name)
+    if graph is None:
+        with section_locks["live_graphs"]:
+            graph = app_data["live_graphs"].setdefault(name, get_default_live_graph_data())
+    return graph
+
+def bump_versions(*sections):
+    for section in sections:
+        section_versions[section].increment()
+
+def check_version(section, rendered_version):
+    # The page already shows `section` as of `rendered_version`; a fresh page has none.
+    version = section_versions[section].value
+    if version == rendered_version:
+        raise PreventUpdate
+    return version
+
+def apply_events(events):
+    # Events in a batch are independent, as they were when each had its own POST: a malformed one
+    # is logged and skipped rather than dropping every event after it.
+    for event in events:
+        try:
+            apply_update(event)
+        except Exception:
+            logging.exception("Skipping malformed dashboard event: %r", event)
+
+def apply_update(payload):
+    update_type = payload.get("type")
+    if update_type == "batch":
+        apply_events(payload.get("events", []))
+    elif update_type == "method_performance":
+        name = payload["name"]
+        duration = payload["duration_ms"]
+        with get_method_lock(name):
+            stat = get_method_details(name)
+            stat.calls += 1
+            # Running mean, so the table sorts and shows it without dividing each row.
+            stat.avg_duration_ms += (duration - stat.avg_duration_ms) / stat.calls
+            graph = get_live_graph(name)
+            slot = graph['appended'] % MAX_GRAPH_POINTS
+            graph['timestamps'][slot] = time.time_ns()
+            graph['tokens'][slot] = graph['pending_tokens']
+            graph['pending_tokens'] = 0
+            graph['appended'] += 1
+        app_data["general_stats"]["total_calls"].increment()
+        bump_versions("general_stats", "method_details")
+    elif update_type == "method_llm_usage":
+        name = payload["name"]
+        tokens = payload["tokens"]
+        with get_method_lock(name):
+            get_method_details(name).total_tokens += tokens["total"]
+            # The agent reports a call's token usage just before its method_performance event, so the
+            # tokens are held until that call's point is appended. Points are final once appended.
+            get_live_graph(name)['pending_tokens'] += tokens["total"]
+        with section_locks["llm_usage"]:
             app_data["llm_usage"]["prompt_tokens"] += tokens["prompt"]
             app_data["llm_usage"]["completion_tokens"] += tokens["completion"]
             app_data["llm_usage"]["total_tokens"] += tokens["total"]
-            if name in app_data["live_graphs"] and len(app_data["live_graphs"][name]['tokens']) > 0:
-                app_data["live_graphs"][name]['tokens'][-1] = tokens["total"]
-        elif update_type == "interaction_time":
-            app_data["general_stats"]["interaction_count"] += 1
+        bump_versions("llm_usage", "method_details")
+    elif update_type == "llm_cache":
+        with section_locks["llm_usage"]:
+            app_data["llm_usage"]["cache_lookups"] += 1
+            if payload.get("hit"):
+                app_data["llm_usage"]["cache_hits"] += 1
+        bump_versions("llm_usage")
+    elif update_type == "interaction_time":
+        app_data["general_stats"]["interaction_count"].increment()
+        with section_locks["general_stats"]:
             app_data["general_stats"]["total_interaction_time_ms"] += payload["duration_ms"]
-        elif update_type == "quality_feedback":
-            app_data["quality_rai"]["quality_scores"].append(payload["score"])
-        elif update_type == "rai_alert":
+        bump_versions("general_stats")
+    elif update_type == "quality_feedback":
+        with section_locks["quality_rai"]:
+            app_data["quality_rai"]["quality_sum"] += payload["score"]
+            app_data["quality_rai"]["quality_count"] += 1
+        bump_versions("quality_rai")
+    elif update_type == "rai_alert":
+        with section_locks["quality_rai"]:
             app_data["quality_rai"]["rai_alerts"].append(payload.get("alert"))
-        elif update_type == "error":
-            app_data["general_stats"]["errors"] += 1
-        elif update_type == "session_end":
-            app_data["session_ended"] = True
-    return jsonify(success=True)
+            app_data["quality_rai"]["rai_alert_count"] += 1
+        bump_versions("rai_alerts")
+    elif update_type == "rai_alerts":
+        with section_locks["quality_rai"]:
+            alerts = payload.get("alerts", [])
+            app_data["quality_rai"]["rai_alerts"].extend(alerts)
+            app_data["quality_rai"]["rai_alert_count"] += len(alerts)
+        bump_versions("rai_alerts")
+    elif update_type == "error":
+        app_data["general_stats"]["errors"].increment()
+        bump_versions("general_stats")
+    elif update_type == "session_end":
+        session_ended.set()
+
+def read_update_body(expected_type):
+    # Parsed straight from the raw body rather than request.json, which would keep a cached copy.
+    # A body that isn't JSON of the expected shape gets a 400, as request.json would have given.
+    try:
+        payload = orjson.loads(request.get_data(cache=False))
+    except orjson.JSONDecodeError:
+        abort(400)
+    if not isinstance(payload, expected_type):
+        abort(400)
+    return payload
+
+@server.route('/update', methods=['POST'])
+def update_data():
+    apply_update(read_update_body(dict))
+    return Response(UPDATE_OK, mimetype='application/json')
+
+@server.route('/update_batch', methods=['POST'])
+def update_batch():
+    # Same as posting {"type": "batch", "events": [...]} to /update, for clients that send a bare array.
+    apply_events(read_update_body(list))
+    return Response(UPDATE_OK, mimetype='application/json')
+
+def tail(data, field, count):
+    # The last `count` points of a ring buffer, oldest first.
+    appended = data['appended']
+    return data[field][np.arange(appended - count, appended) % MAX_GRAPH_POINTS]
+
+def window(data, field):
+    # Every point still held in a ring buffer, oldest first.
+    return tail(data, field, min(data['appended'], MAX_GRAPH_POINTS))
+
+def as_local_datetimes(timestamps):
+    # Points are stamped with UTC epoch nanoseconds; the axis shows them in the dashboard's local time.
+    return (timestamps + time.localtime().tm_gmtoff * 1_000_000_000).view('datetime64[ns]')
+
+def downsample(timestamps, values, n_out):
+    # Indices of at most `n_out` points that keep the shape of `values`: MinMaxLTTB when
+    # tsdownsample is installed, otherwise evenly spaced points (always keeping the latest).
+    if len(values) <= n_out:
+        return slice(None)
+    if MinMaxLTTBDownsampler is not None:
+        return MinMaxLTTBDownsampler().downsample(timestamps, values, n_out=n_out)
+    return np.linspace(0, len(values) - 1, n_out).astype(np.int64)
+
+def build_live_figure(series):
+    # One figure with a row per method: row i holds method i's calls (trace 2i) and tokens (trace 2i + 1).
+    rows = len(series)
+    fig = make_subplots(
+        rows=rows, cols=1, shared_xaxes=True, specs=[[{"secondary_y": True}]] * rows,
+        subplot_titles=[f'Activity for: {name}' for name, _, _ in series],
+    )
+    for row, (name, timestamps, tokens) in enumerate(series, start=1):
+        plotted = downsample(timestamps, tokens, MAX_PLOTTED_POINTS)
+        timestamps, tokens = as_local_datetimes(timestamps[plotted]), tokens[plotted]
+        # WebGL traces, drawn as steps so they read like the bars they replace.
+        fig.add_trace(go.Scattergl(x=timestamps, y=np.ones(len(timestamps), dtype=np.int32), name='Calls', mode='markers',
+                                   marker_color='cyan', legendgroup='calls', showlegend=row == 1), row=row, col=1)
+        fig.add_trace(go.Scattergl(x=timestamps, y=tokens, name='Tokens', mode='lines+markers', line_shape='hv', fill='tozeroy',
+                                   marker_color='orange', legendgroup='tokens', showlegend=row == 1), row=row, col=1, secondary_y=True)
+        fig.update_yaxes(title_text='Calls', row=row, col=1, secondary_y=False)
+        fig.update_yaxes(title_text='Tokens', rangemode='tozero', row=row, col=1, secondary_y=True)
+    fig.update_xaxes(tickformat='%H:%M:%S')
+    fig.update_layout(
+        template='plotly_dark',
+        height=300 * rows,
+        # Keep the user's zoom and legend toggles when a page's figure is rebuilt for a new method or
+        # a fresh downsample; the rebuild also resets that page's sent counts, and extendData carries on from there.
+        uirevision='live-graph',
+        legend=dict(yanchor="top", y=0.99, xanchor="left", x=0.01)
+    )
+    return fig
 
 def create_metric_card(title, value_id):
     return dbc.Card(
@@ -92,6 +321,11 @@ def create_metric_card(title, value_id):
 
 app.layout = dbc.Container([
     dcc.Interval(id='interval-component', interval=1*1000, n_intervals=0),
+    dcc.Store(id='general-stats-version'),
+    dcc.Store(id='llm-usage-version'),
+    dcc.Store(id='quality-rai-version'),
+    dcc.Store(id='rai-alerts-version'),
+    dcc.Store(id='final-table-version'),
     html.H1("💮 Kansatsu Dashboard", className="text-center my-4"),
     html.H3("💹 General Stats"),
     dbc.Row([
@@ -105,6 +339,7 @@ app.layout = dbc.Container([
         dbc.Col(create_metric_card("Prompt Tokens", "prompt-tokens-value")),
         dbc.Col(create_metric_card("Completion Tokens", "completion-tokens-value")),
         dbc.Col(create_metric_card("Total Tokens", "total-tokens-value")),
+        dbc.Col(create_metric_card("Semantic Cache Hit Rate", "cache-hit-rate-value")),
     ]),
     html.Hr(),
     html.H3("📜 Quality & Responsible AI"),
@@ -124,7 +359,9 @@ app.layout = dbc.Container([
     ),
     html.Hr(),
     html.H3("🔴 Live Method Activity"),
-    html.Div(id='live-graphs-container'),
+    dcc.Store(id='live-graph-methods'),
+    dcc.Store(id='live-graph-sent'),
+    dcc.Graph(id='live-graph', style={'display': 'none'}),
     html.Hr(),
     html.H3("📋 Final Summary Table"),
     html.Div(id='final-table-container')
@@ -135,81 +372,188 @@ app.layout = dbc.Container([
         Output('total-calls-value', 'children'),
         Output('total-errors-value', 'children'),
         Output('avg-interaction-time-value', 'children'),
+        Output('general-stats-version', 'data'),
+    ],
+    [Input('interval-component', 'n_intervals')],
+    [State('general-stats-version', 'data')]
+)
+def update_general_stats(n, rendered_version):
+    version = check_version("general_stats", rendered_version)
+    gs = app_data["general_stats"]
+    total_calls, errors, interaction_count = gs["total_calls"].value, gs["errors"].value, gs["interaction_count"].value
+    with section_locks["general_stats"]:
+        total_interaction_time_ms = gs["total_interaction_time_ms"]
+    avg_interaction_time = (total_interaction_time_ms / interaction_count) if interaction_count > 0 else 0
+    return f"{total_calls}", f"{errors}", f"{avg_interaction_time:.0f}", version
+
+@app.callback(
+    [
         Output('prompt-tokens-value', 'children'),
         Output('completion-tokens-value', 'children'),
         Output('total-tokens-value', 'children'),
+        Output('cache-hit-rate-value', 'children'),
+        Output('llm-usage-version', 'data'),
+    ],
+    [Input('interval-component', 'n_intervals')],
+    [State('llm-usage-version', 'data')]
+)
+def update_llm_usage(n, rendered_version):
+    version = check_version("llm_usage", rendered_version)
+    with section_locks["llm_usage"]:
+        llm = dict(app_data["llm_usage"])
+    cache_hit_rate = (llm["cache_hits"] / llm["cache_lookups"] * 100) if llm["cache_lookups"] > 0 else 0
+    return f"{llm['prompt_tokens']}", f"{llm['completion_tokens']}", f"{llm['total_tokens']}", f"{cache_hit_rate:.0f}%", version
+
+@app.callback(
+    [
         Output('avg-quality-score-value', 'children'),
+        Output('quality-rai-version', 'data'),
+    ],
+    [Input('interval-component', 'n_intervals')],
+    [State('quality-rai-version', 'data')]
+)
+def update_quality_rai(n, rendered_version):
+    version = check_version("quality_rai", rendered_version)
+    with section_locks["quality_rai"]:
+        quality_sum, quality_count = app_data["quality_rai"]["quality_sum"], app_data["quality_rai"]["quality_count"]
+    avg_quality_score = (quality_sum / quality_count) if quality_count > 0 else 0
+    return f"{avg_quality_score:.2f}", version
+
+@app.callback(
+    [
         Output('rai-alerts-value', 'children'),
-        Output('live-graphs-container', 'children'),
-        Output('final-table-container', 'children'),
         Output('rai-alert-details-card', 'style'),
         Output('rai-alert-details-list', 'children'),
+        Output('rai-alerts-version', 'data'),
+    ],
+    [Input('interval-component', 'n_intervals')],
+    [State('rai-alerts-version', 'data')]
+)
+def update_rai_alerts(n, rendered_version):
+    version = check_version("rai_alerts", rendered_version)
+    with rai_alert_cache_lock:
+        with section_locks["quality_rai"]:
+            rai_alerts = app_data["quality_rai"]["rai_alerts"]
+            rai_alert_count = app_data["quality_rai"]["rai_alert_count"]
+            unseen = min(rai_alert_count - rai_alert_cache["seen"], len(rai_alerts))
+            new_alerts = list(itertools.islice(rai_alerts, len(rai_alerts) - unseen, None))
+        for alert in new_alerts:
+            if alert:
+                rai_alert_cache["items"].append(
+                    html.Li([
+                        html.Strong(f"{alert.get('type', 'N/A')}: "),
+                        html.Span(f"{alert.get('details', 'No details')}")
+                    ], className="text-warning")
+                )
+        rai_alert_cache["seen"] = rai_alert_count
+        alert_list_items = list(rai_alert_cache["items"])
+    card_style = {'display': 'block', 'marginTop': '15px'} if rai_alert_count > 0 else {'display': 'none'}
+    return f"{rai_alert_count}", card_style, alert_list_items, version
+
+def build_final_table():
+    with section_locks["method_details"]:
+        method_details = list(app_data["method_details"].items())
+    snapshots = []
+    for name, stat in method_details:
+        with get_method_lock(name):
+            snapshots.append((name, stat.calls, stat.avg_duration_ms, stat.total_tokens))
+    table_data = []
+    slowest = heapq.nlargest(MAX_TABLE_ROWS, snapshots, key=lambda snapshot: snapshot[2])
+    for name, calls, avg_time, total_tokens in slowest:
+        avg_tokens = total_tokens / calls if calls > 0 else 0
+        table_data.append({
+            'Method Name': name, 'Calls': calls, 'Avg Time (ms)': f"{avg_time:.2f}",
+            'Total Tokens': total_tokens, 'Avg Tokens': f"{avg_tokens:.0f}"
+        })
+    table_children = []
+    if table_data:
+        table_children.append(dash_table.DataTable(
+            data=table_data,
+            columns=[{"name": i, "id": i} for i in table_data[0].keys()],
+            style_cell={'textAlign': 'left', 'backgroundColor': '#343a40', 'color': 'white'},
+            style_header={'fontWeight': 'bold', 'border': '1px solid pink'},
+            style_data={'border': '1px solid grey'},
+        ))
+    return table_children
+
+@app.callback(
+    [
+        Output('final-table-container', 'children'),
+        Output('final-table-version', 'data'),
+    ],
+    [Input('interval-component', 'n_intervals')],
+    [State('final-table-version', 'data')]
+)
+def update_final_table(n, rendered_version):
+    if not session_ended.is_set():
+        raise PreventUpdate
+    version = check_version("method_details", rendered_version)
+    # Methods rarely change after the session ends, so every page gets the same table until they do.
+    with final_table_lock:
+        if final_table_cache["version"] != version:
+            final_table_cache.update(version=version, children=build_final_table())
+        return final_table_cache["children"], version
+
+def render_live_graph(graph_names):
+    # A full figure from a fresh downsample of each method's history, with the page's new sent counts.
+    series, sent = [], {}
+    for name in graph_names:
+        data = app_data["live_graphs"][name]
+        with get_method_lock(name):
+            timestamps, tokens = window(data, 'timestamps'), window(data, 'tokens')
+            sent[name] = [data['appended'], min(len(tokens), MAX_PLOTTED_POINTS)]
+        series.append((name, timestamps, tokens))
+    return build_live_figure(series), sent
+
+@app.callback(
+    [
+        Output('live-graph', 'figure'),
+        Output('live-graph', 'style'),
+        Output('live-graph', 'extendData'),
+        Output('live-graph-methods', 'data'),
+        Output('live-graph-sent', 'data'),
     ],
-    [Input('interval-component', 'n_intervals')]
+    [Input('interval-component', 'n_intervals')],
+    [State('live-graph-methods', 'data'), State('live-graph-sent', 'data')],
+    prevent_initial_call=True
 )
-def update_metrics(n):
-    with data_lock:
-        gs = app_data["general_stats"]
-        llm = app_data["llm_usage"]
-        qr = app_data["quality_rai"]
-        avg_interaction_time = (gs["total_interaction_time_ms"] / gs["interaction_count"]) if gs["interaction_count"] > 0 else 0
-        avg_quality_score = (sum(qr["quality_scores"]) / len(qr["quality_scores"])) if qr["quality_scores"] else 0
-        graph_children = []
-        for name, data in app_data["live_graphs"].items():
-            fig = go.Figure()
-            timestamps = list(data['timestamps'])
-            fig.add_trace(go.Bar(x=timestamps, y=list(data['calls']), name='Calls', marker_color='cyan'))
-            fig.add_trace(go.Bar(x=timestamps, y=list(data['tokens']), name='Tokens', marker_color='orange', yaxis='y2'))
-            fig.update_layout(
-                title=f'Activity for: {name}',
-                template='plotly_dark',
-                xaxis=dict(tickformat='%H:%M:%S'),
-                yaxis=dict(title='Calls'),
-                yaxis2=dict(title='Tokens', overlaying='y', side='right', range=[0, max(1, max(data['tokens'] or [1])) * 1.1]),
-                barmode='group',
-                legend=dict(yanchor="top", y=0.99, xanchor="left", x=0.01)
-            )
-            graph_children.append(dcc.Graph(figure=fig))
-        table_children = []
-        if app_data["session_ended"]:
-            table_data = []
-            for name, data in app_data["method_details"].items():
-                calls = data['calls']
-                avg_time = data['total_duration_ms'] / calls if calls > 0 else 0
-                total_tokens = data.get('total_tokens', 0)
-                avg_tokens = total_tokens / calls if calls > 0 else 0
-                table_data.append({
-                    'Method Name': name, 'Calls': calls, 'Avg Time (ms)': f"{avg_time:.2f}",
-                    'Total Tokens': total_tokens, 'Avg Tokens': f"{avg_tokens:.0f}"
-                })
-            if table_data:
-                table_data = sorted(table_data, key=lambda x: float(x['Avg Time (ms)']), reverse=True)
-                table_children.append(dash_table.DataTable(
-                    data=table_data,
-                    columns=[{"name": i, "id": i} for i in table_data[0].keys()],
-                    style_cell={'textAlign': 'left', 'backgroundColor': '#343a40', 'color': 'white'},
-                    style_header={'fontWeight': 'bold', 'border': '1px solid pink'},
-                    style_data={'border': '1px solid grey'},
-                ))
-        rai_alerts = qr.get("rai_alerts", [])
-        rai_alert_count = len(rai_alerts)
-        alert_list_items = []
-        if rai_alert_count > 0:
-            for alert in rai_alerts:
-                if alert:
-                    alert_list_items.append(
-                        html.Li([
-                            html.Strong(f"{alert.get('type', 'N/A')}: "),
-                            html.Span(f"{alert.get('details', 'No details')}")
-                        ], className="text-warning")
-                    )
-        card_style = {'display': 'block', 'marginTop': '15px'} if rai_alert_count > 0 else {'display': 'none'}
-        return (
-            f"{gs['total_calls']}", f"{gs['errors']}", f"{avg_interaction_time:.0f}",
-            f"{llm['prompt_tokens']}", f"{llm['completion_tokens']}", f"{llm['total_tokens']}",
-            f"{avg_quality_score:.2f}", f"{rai_alert_count}", graph_children, table_children,
-            card_style, alert_list_items
-        )
+def update_live_graph(n, rendered_names, sent):
+    # The figure is built once per set of methods and then grown with extendData. `sent` holds this
+    # page's [points sent, points plotted] per method, so every open page gets every point; once
+    # extending would take a trace past MAX_EXTENDED_POINTS the figure is rebuilt from a fresh
+    # downsample instead, so the page keeps showing the whole retained history.
+    # Rebuilding and extending happen in the same callback, so a tick never sends points twice.
+    with section_locks["live_graphs"]:
+        live_graphs = list(app_data["live_graphs"].items())
+    graph_names = [name for name, data in live_graphs if data['appended']]
+    if graph_names != (rendered_names or []):
+        figure, sent = render_live_graph(graph_names)
+        return figure, {'display': 'block'}, dash.no_update, graph_names, sent
+    xs, ys, trace_indices, sent = [], [], [], dict(sent or {})
+    for row, name in enumerate(graph_names):
+        data = app_data["live_graphs"][name]
+        synced, plotted = sent.get(name, (0, 0))
+        with get_method_lock(name):
+            appended = data['appended']
+            new_points = appended - synced
+            if new_points <= 0:
+                continue
+            if plotted + new_points > MAX_EXTENDED_POINTS:
+                break
+            timestamps = as_local_datetimes(tail(data, 'timestamps', new_points))
+            tokens = tail(data, 'tokens', new_points)
+        sent[name] = [appended, plotted + new_points]
+        xs += [timestamps, timestamps]
+        ys += [np.ones(new_points, dtype=np.int32), tokens]
+        trace_indices += [2 * row, 2 * row + 1]
+    else:
+        if not trace_indices:
+            raise PreventUpdate
+        extension = ({'x': xs, 'y': ys}, trace_indices, MAX_EXTENDED_POINTS)
+        return dash.no_update, dash.no_update, extension, dash.no_update, sent
+    # Extending would push a trace past the cap and drop history from the page's view.
+    figure, sent = render_live_graph(graph_names)
+    return figure, dash.no_update, dash.no_update, dash.no_update, sent
 
 def main():
     parser = argparse.ArgumentParser(description="Run the Kansatsu Dashboard.", add_help = False)
@@ -219,6 +563,7 @@ def main():
     
     parser.add_argument("--host", type=str, default="127.0.0.1", help="Host IP to run the dashboard on.")
     parser.add_argument("--port", type=int, default=9999, help="Port to run the dashboard on.")
+    parser.add_argument("--workers", type=int, default=8, help="Number of threads serving agent updates and the dashboard page.")
     args = parser.parse_args()
 
     if args.version:
@@ -230,7 +575,11 @@ def main():
         sys.exit(0)
     
     print(f"💮 Starting Kansatsu Dashboard at http://{args.host}:{args.port}\n\ncommands:\n* kansatsu-dashboard --version\nkansatsu-dashboard --help")
-    app.run(host=args.host, port=args.port)
+    if waitress is not None:
+        waitress.serve(server, host=args.host, port=args.port, threads=args.workers)
+    else:
+        # Werkzeug's threaded dev server, without the debugger or reloader.
+        app.run(host=args.host, port=args.port, debug=False, use_reloader=False, threaded=True)
 
 if __name__ == '__main__':
     main()
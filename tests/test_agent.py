@@ -1,27 +1,65 @@
 # FILE: tests/test_agent.py
 
+import asyncio
+from decimal import Decimal
+import inspect
+import time
+import numpy as np
+import orjson
 import pytest
 import requests
-from unittest.mock import patch, call
+from unittest.mock import MagicMock, patch
 
 from kansatsu.agent import Kansatsu
+from kansatsu.cache import SemanticCache
 
 DUMMY_URL = "http://localhost:9999/test"
 
-@patch('kansatsu.agent.requests.post')
+def sent_payloads(mock_post):
+    """Decodes the JSON bodies posted to the dashboard."""
+    payloads = []
+    for c in mock_post.call_args_list:
+        assert c.args == (DUMMY_URL,)
+        assert c.kwargs['headers'] == {"Content-Type": "application/json"}
+        assert c.kwargs['timeout'] == 0.5
+        payloads.append(orjson.loads(c.kwargs['data']))
+    return payloads
+
+def sent_events(mock_post):
+    """Flattens the batches posted to the dashboard into a list of events."""
+    events = []
+    for payload in sent_payloads(mock_post):
+        assert payload['type'] == 'batch'
+        events.extend(payload['events'])
+    return events
+
+@patch('kansatsu.agent.requests.Session.post')
 def test_log_method_performance_sends_to_dashboard(mock_post):
     """
     Tests that log_method_performance sends the correct payload to the dashboard.
     """
     obs = Kansatsu(service_name="test-service", dashboard_url=DUMMY_URL)
     obs.log_method_performance("my_test_func", 123.45)
-    mock_post.assert_called_once_with(
-        DUMMY_URL,
-        json={"type": "method_performance", "name": "my_test_func", "duration_ms": 123.45},
-        timeout=0.5
-    )
+    assert obs.flush()
+    assert sent_payloads(mock_post) == [
+        {"type": "batch", "events": [{"type": "method_performance", "name": "my_test_func", "duration_ms": 123.45}]}
+    ]
+
+@patch('kansatsu.agent.requests.Session.post')
+def test_numpy_and_decimal_values_are_sent(mock_post):
+    """
+    Tests that numpy scalars and Decimals in events are encoded instead of stopping the sender.
+    """
+    obs = Kansatsu(service_name="test-service", dashboard_url=DUMMY_URL)
+    obs.log_method_performance("np_func", np.float64(1.5))
+    obs.log_method_llm_usage("np_func", np.int64(2), Decimal("3"), 5)
+    assert obs.flush()
+    assert sent_events(mock_post) == [
+        {"type": "method_performance", "name": "np_func", "duration_ms": 1.5},
+        {"type": "method_llm_usage", "name": "np_func", "tokens": {"prompt": 2, "completion": 3.0, "total": 5}},
+    ]
 
-@patch('kansatsu.agent.requests.post')
+@patch('kansatsu.agent.requests.Session.post')
 def test_monitor_with_llm_sends_two_events(mock_post):
     obs = Kansatsu(service_name="test-service", dashboard_url=DUMMY_URL)
 
@@ -38,25 +76,60 @@ def test_monitor_with_llm_sends_two_events(mock_post):
         return MockLLMResponse()
 
     llm_call_text()
+    obs.flush()
+
+    call_types = [e['type'] for e in sent_events(mock_post)]
+    assert sorted(call_types) == ['method_llm_usage', 'method_performance']
 
-    assert mock_post.call_count == 2
+@patch('kansatsu.agent.requests.Session.post')
+def test_events_are_coalesced_into_one_post(mock_post):
+    """Tests that events queued within one send window share a single POST."""
+    obs = Kansatsu(service_name="test-service", dashboard_url=DUMMY_URL)
+    for i in range(5):
+        obs.log_method_performance(f"func_{i}", float(i))
+    obs.flush()
 
-    call_types = [c.kwargs['json']['type'] for c in mock_post.call_args_list]
-    assert 'method_performance' in call_types
-    assert 'method_llm_usage' in call_types
+    assert mock_post.call_count == 1
+    assert [e['name'] for e in sent_events(mock_post)] == [f"func_{i}" for i in range(5)]
 
-@patch('kansatsu.agent.requests.post')
+@patch('kansatsu.agent.requests.Session.post')
 def test_log_quality_feedback_sends_to_dashboard(mock_post):
-    """Tests that quality feedback is sent correctly."""
+    """Tests that quality feedback is buffered and sent correctly on flush."""
     obs = Kansatsu(service_name="test-service", dashboard_url=DUMMY_URL)
     obs.log_quality_feedback(5)
-    mock_post.assert_called_once_with(
-        DUMMY_URL,
-        json={"type": "quality_feedback", "score": 5},
-        timeout=0.5
-    )
+    time.sleep(0.1)
+    mock_post.assert_not_called()
+
+    obs.flush()
+    assert sent_events(mock_post) == [{"type": "quality_feedback", "score": 5}]
+
+@patch('kansatsu.agent.requests.Session.post')
+def test_buffered_metrics_are_sent_in_one_batch(mock_post):
+    """Tests that interaction times and feedback are aggregated into a single POST."""
+    obs = Kansatsu(service_name="test-service", dashboard_url=DUMMY_URL)
+    obs.log_interaction_time(1000)
+    obs.log_quality_feedback(4)
+    obs.log_interaction_time(500)
+
+    obs.flush()
+    obs.flush()
+
+    assert sent_payloads(mock_post) == [{"type": "batch", "events": [
+        {"type": "interaction_time", "duration_ms": 1000},
+        {"type": "quality_feedback", "score": 4},
+        {"type": "interaction_time", "duration_ms": 500},
+    ]}]
+
+@patch('kansatsu.agent.requests.Session.post')
+def test_shutdown_flushes_buffered_metrics_before_session_end(mock_post):
+    obs = Kansatsu(service_name="test-service", dashboard_url=DUMMY_URL)
+    obs.log_quality_feedback(3)
+    obs.shutdown()
+
+    call_types = [e['type'] for e in sent_events(mock_post)]
+    assert call_types == ["quality_feedback", "session_end"]
 
-@patch('kansatsu.agent.requests.post')
+@patch('kansatsu.agent.requests.Session.post')
 def test_error_event_sends_to_dashboard(mock_post):
     """
     Tests that an error logged via the monitor sends both an 'error' event
@@ -70,38 +143,51 @@ def test_error_event_sends_to_dashboard(mock_post):
 
     with pytest.raises(ValueError):
         function_that_fails()
+    obs.flush()
 
-    assert mock_post.call_count == 2
-    expected_error_call = call(DUMMY_URL, json={"type": "error"}, timeout=0.5)
-    assert expected_error_call in mock_post.call_args_list
+    events = sent_events(mock_post)
+    assert len(events) == 2
+    assert {"type": "error"} in events
 
-    found_performance_call = any(
-        c.kwargs.get('json', {}).get('type') == 'method_performance'
-        for c in mock_post.call_args_list
-    )
+    found_performance_call = any(e.get('type') == 'method_performance' for e in events)
     assert found_performance_call, "Expected a method_performance call, but it was not found."
 
-@patch('kansatsu.agent.requests.post')
+@patch('kansatsu.agent.requests.Session.post')
 def test_shutdown_sends_to_dashboard(mock_post):
     """Tests that shutdown sends the 'session_end' event."""
     obs = Kansatsu(service_name="test-service", dashboard_url=DUMMY_URL)
     obs.shutdown()
-    mock_post.assert_called_once_with(
-        DUMMY_URL,
-        json={"type": "session_end"},
-        timeout=0.5
-    )
+    assert sent_payloads(mock_post) == [{"type": "batch", "events": [{"type": "session_end"}]}]
 
-@patch('kansatsu.agent.requests.post')
+@patch('kansatsu.agent.requests.Session.post')
+def test_shutdown_joins_the_metric_flusher_before_session_end(mock_post):
+    """The flusher thread has exited before session_end is queued, so no buffered event trails it."""
+    obs = Kansatsu(service_name="test-service", dashboard_url=DUMMY_URL)
+    obs.log_quality_feedback(4)
+    obs.shutdown()
+    assert not obs._metric_flusher.is_alive()
+    assert sent_events(mock_post) == [{"type": "quality_feedback", "score": 4}, {"type": "session_end"}]
+
+@patch('kansatsu.agent.requests.Session.post')
+def test_flush_after_shutdown_returns_immediately(mock_post):
+    """Once the sender has stopped, flush() has nothing to wait on."""
+    obs = Kansatsu(service_name="test-service", dashboard_url=DUMMY_URL)
+    obs.shutdown()
+    start = time.monotonic()
+    assert obs.flush(timeout=2.0)
+    assert time.monotonic() - start < 1.0
+
+@patch('kansatsu.agent.requests.Session.post')
 def test_no_dashboard_url_prevents_sending(mock_post):
     """
     Ensures that if no dashboard_url is provided, no network calls are made.
     """
     obs = Kansatsu(service_name="test-service", dashboard_url=None)
     obs.log_method_performance("some_func", 100)
+    obs.flush()
     mock_post.assert_not_called()
 
-@patch('kansatsu.agent.requests.post')
+@patch('kansatsu.agent.requests.Session.post')
 def test_dashboard_connection_error_is_handled_gracefully(mock_post, caplog):
     """
     Tests that if the dashboard is down, the agent doesn't crash and a warning is logged once.
@@ -110,9 +196,400 @@ def test_dashboard_connection_error_is_handled_gracefully(mock_post, caplog):
     obs = Kansatsu(service_name="test-service", dashboard_url=DUMMY_URL)
 
     obs.log_interaction_time(1000)
+    obs.flush()
 
     assert "Could not connect to dashboard" in caplog.text
     assert "Test connection failed" in caplog.text
 
     obs.log_interaction_time(1000)
+    obs.flush()
     assert caplog.text.count("Could not connect to dashboard") == 1
+
+
+@patch('kansatsu.agent.requests.Session.post')
+def test_unexpected_send_error_drops_only_that_batch(mock_post, caplog):
+    """
+    Tests that an unexpected exception while sending drops that batch but keeps the sender running.
+    """
+    mock_post.side_effect = [ValueError("boom"), None]
+    obs = Kansatsu(service_name="test-service", dashboard_url=DUMMY_URL)
+
+    obs.log_method_performance("first", 1.0)
+    assert obs.flush()
+    assert "Dropped 1 dashboard events" in caplog.text
+
+    obs.log_method_performance("second", 2.0)
+    assert obs.flush()
+    assert orjson.loads(mock_post.call_args.kwargs['data'])['events'] == [
+        {"type": "method_performance", "name": "second", "duration_ms": 2.0}
+    ]
+
+@patch('kansatsu.agent.requests.Session.post')
+def test_check_responsible_ai_prefilter_matches_full_scan(mock_post):
+    """
+    Tests that the RE2 prefilter (when available) finds the same PII as scanning
+    every pattern with `re`.
+    """
+    obs = Kansatsu(service_name="test-service", dashboard_url=None)
+    obs.nlp = None
+    text = "Email jane@example.com or call 555-867-5309. SSN 123-45-6789, MRN: AB-1234."
+
+    prefiltered = obs.check_responsible_ai(text, MagicMock())
+    obs._pii_set = None
+    obs._rai_cache.clear()
+    full_scan = obs.check_responsible_ai(text, MagicMock())
+
+    assert prefiltered == full_scan
+    found_types = {f["type"] for f in full_scan["findings"]}
+    assert {"EMAIL", "PHONE_NUMBER_US", "SSN", "MRN"} <= found_types
+
+@patch('kansatsu.agent.requests.Session.post')
+def test_prefilter_is_bypassed_for_whitespace_re2_treats_differently(mock_post):
+    """
+    Tests that text with whitespace only `re` treats as \\s (vertical tab, \\x1c-\\x1f) still gets the full scan.
+    """
+    obs = Kansatsu(service_name="test-service", dashboard_url=None)
+    obs.nlp = None
+    for separator in ("\v", "\x1c", "\x1f"):
+        obs._rai_cache.clear()
+        result = obs.check_responsible_ai(f"call 555{separator}123{separator}4567", MagicMock())
+        assert "PHONE_NUMBER_US" in {f["type"] for f in result["findings"]}
+
+@patch('kansatsu.agent.requests.Session.post')
+def test_cache_llm_only_calls_fn_on_miss(mock_post):
+    obs = Kansatsu(service_name="test-service", dashboard_url=DUMMY_URL)
+    cache = SemanticCache(embed_fn=lambda text: [1.0, 0.0])
+    llm_call = MagicMock(return_value={"tool_name": "calculate_square_area"})
+
+    first = obs.cache_llm(cache, "square side 4", llm_call, "square side 4")
+    second = obs.cache_llm(cache, "side 4 square", llm_call, "side 4 square")
+
+    assert first == second == {"tool_name": "calculate_square_area"}
+    llm_call.assert_called_once_with("square side 4")
+    obs.flush()
+    cache_events = [e for e in sent_events(mock_post) if e['type'] == 'llm_cache']
+    assert cache_events == [{"type": "llm_cache", "hit": False}, {"type": "llm_cache", "hit": True}]
+
+@patch('kansatsu.agent.requests.Session.post')
+def test_monitor_wraps_coroutine_functions(mock_post):
+    """
+    Tests that an async function stays awaitable and its duration covers the awaited work.
+    """
+    obs = Kansatsu(service_name="test-service", dashboard_url=DUMMY_URL)
+
+    @obs.monitor()
+    async def slow_call():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    assert inspect.iscoroutinefunction(slow_call)
+    assert asyncio.run(slow_call()) == "done"
+    obs.flush()
+
+    performance_calls = [e for e in sent_events(mock_post) if e['type'] == 'method_performance']
+    assert len(performance_calls) == 1
+    assert performance_calls[0]["name"] == "slow_call"
+    assert performance_calls[0]["duration_ms"] >= 50
+
+@patch('kansatsu.agent.requests.Session.post')
+def test_repeated_text_reuses_scan_but_still_alerts(mock_post):
+    """
+    Tests that a repeated text is only scanned once while every call still records
+    its alerts and span events.
+    """
+    obs = Kansatsu(service_name="test-service", dashboard_url=None)
+    obs.nlp = None
+    text = "Call him at 555-867-5309."
+    span = MagicMock()
+
+    with patch.object(obs, '_scan_pii', wraps=obs._scan_pii) as scan:
+        first = obs.check_responsible_ai(text, span)
+        second = obs.check_responsible_ai(text, span)
+
+    assert scan.call_count == 1
+    assert first == second
+    assert first["findings_count"] == 1
+    assert len(obs._metrics["rai_alerts"]) == 2
+    assert span.add_event.call_count == 2
+
+@patch('kansatsu.agent.requests.Session.post')
+def test_otlp_endpoint_records_interaction_metrics(mock_post):
+    """
+    Tests that interaction time and feedback also go to the OTLP instruments when an endpoint is set.
+    """
+    pytest.importorskip("opentelemetry.exporter.otlp.proto.http")
+    obs = Kansatsu(service_name="test-service", dashboard_url=None, otlp_endpoint="http://localhost:4318/")
+    assert obs._meter_provider is not None
+    obs._interaction_histogram = MagicMock()
+    obs._quality_gauge = MagicMock()
+
+    obs.log_interaction_time(42.0)
+    obs.log_quality_feedback(4)
+
+    obs._interaction_histogram.record.assert_called_once_with(42.0)
+    obs._quality_gauge.set.assert_called_once_with(4)
+
+def test_pii_set_is_shared_between_instances():
+    """
+    Tests that agents reuse one compiled RE2 set instead of building their own.
+    """
+    pytest.importorskip("re2")
+    first = Kansatsu(service_name="svc-a", dashboard_url=None)
+    second = Kansatsu(service_name="svc-b", dashboard_url=None)
+    assert first._pii_set is not None
+    assert first._pii_set is second._pii_set
+
+@patch('kansatsu.agent.requests.Session.post')
+def test_responsible_ai_stream_flags_pii_split_across_chunks(mock_post):
+    """
+    Tests that streamed chunks are prefiltered as they arrive and fully checked at the end.
+    """
+    pytest.importorskip("re2")
+    obs = Kansatsu(service_name="test-service", dashboard_url=None)
+    span = MagicMock()
+    rai_stream = obs.responsible_ai_stream(span)
+
+    rai_stream.feed("The patient's SSN is 123-4")
+    assert not rai_stream.flagged
+    rai_stream.feed("5-6789, please update the chart.")
+    assert rai_stream.flagged
+    span.set_attribute.assert_called_with("rai.pii_found", True)
+
+    result = rai_stream.finish()
+    assert rai_stream.text() == "The patient's SSN is 123-45-6789, please update the chart."
+    assert result["pii_found"] is True
+    assert [f["type"] for f in result["findings"]] == ["SSN"]
+
+@patch('kansatsu.agent.requests.Session.post')
+def test_hyperscan_prefilter_matches_full_scan(mock_post):
+    """
+    Tests that the Hyperscan database reports every PII type the full scan finds.
+    """
+    pytest.importorskip("hyperscan")
+    from kansatsu.agent import _build_hyperscan_set
+
+    obs = Kansatsu(service_name="test-service", dashboard_url=None)
+    obs._pii_set, obs._pii_set_labels = _build_hyperscan_set()
+    text = "Email me at jane.doe@example.com or call 555-123-4567. My SSN is 123-45-6789 and DOB: 01/02/1990."
+
+    matched = obs._match_pii_types(text)
+    assert matched == {"EMAIL", "PHONE_NUMBER_US", "SSN", "DATE_OF_BIRTH"}
+    assert obs._match_pii_types("nothing sensitive here") == set()
+    full_types = {f[0] for f in obs._scan_pii(text)}
+    assert full_types <= matched | {"PERSON_NAME", "LOCATION", "DATE_ENTITY", "ORGANIZATION"}
+
+@patch('kansatsu.agent.requests.Session.post')
+def test_spacy_is_skipped_when_regex_covers_the_text(mock_post):
+    """
+    Tests that NER only runs when regex matches leave enough of the text uncovered.
+    """
+    obs = Kansatsu(service_name="test-service", dashboard_url=None)
+    obs.nlp = MagicMock(return_value=MagicMock(ents=[]))
+
+    obs.check_responsible_ai("123-45-6789", MagicMock())
+    obs.nlp.assert_not_called()
+
+    obs.check_responsible_ai("Jane Doe's SSN is 123-45-6789", MagicMock())
+    obs.nlp.assert_called_once_with("Jane Doe's SSN is 123-45-6789")
+
+    obs.check_responsible_ai("nothing here looks like a name or a date", MagicMock())
+    obs.nlp.assert_called_once()
+
+@patch('kansatsu.agent.get_nlp')
+def test_spacy_model_is_not_loaded_for_skipped_text(mock_get_nlp):
+    """
+    Tests that texts the cheap checks rule out never trigger the lazy spaCy load.
+    """
+    obs = Kansatsu(service_name="test-service", dashboard_url=None)
+    obs.check_responsible_ai("nothing here looks like a name or a date", MagicMock())
+    obs.check_responsible_ai("123-45-6789", MagicMock())
+    mock_get_nlp.assert_not_called()
+
+@patch('kansatsu.agent.requests.Session.post')
+def test_check_responsible_ai_batch_pipes_texts_through_spacy(mock_post):
+    """
+    Tests that batch checks send every uncached text through one nlp.pipe call.
+    """
+    obs = Kansatsu(service_name="test-service", dashboard_url=None)
+    obs.nlp = MagicMock()
+    obs.nlp.pipe.side_effect = lambda texts, batch_size: [MagicMock(ents=[]) for _ in texts]
+    texts = ["Contact me at jane.doe@example.com", "Nothing to see here", "123-45-6789"]
+
+    results = obs.check_responsible_ai_batch(texts, MagicMock())
+
+    obs.nlp.pipe.assert_called_once()
+    obs.nlp.assert_not_called()
+    assert [r["pii_found"] for r in results] == [True, False, True]
+    assert [f["type"] for f in results[0]["findings"]] == ["EMAIL"]
+
+def test_luhn_fast_path_matches_digit_loop():
+    """
+    Tests that the 16-digit SWAR Luhn check agrees with the general digit loop.
+    """
+    from kansatsu.agent import is_luhn_valid, _luhn16_checksum
+
+    def reference_checksum(number):
+        total = 0
+        for i, digit in enumerate(int(d) for d in reversed(number)):
+            if i % 2 == 1:
+                digit = digit * 2 - 9 if digit > 4 else digit * 2
+            total += digit
+        return total
+
+    for number in ["4111111111111111", "5500000000000004", "9999999999999999", "0000000000000000", "1234567812345678"]:
+        assert _luhn16_checksum(number) == reference_checksum(number)
+    assert is_luhn_valid("4111111111111111")
+    assert not is_luhn_valid("4111111111111112")
+    assert is_luhn_valid("378282246310005")
+    assert not is_luhn_valid("4111-1111")
+
+def test_counters_from_many_threads_are_summed():
+    """
+    Tests that per-thread counter shards add up to the totals reported in the summary.
+    """
+    import threading
+
+    obs = Kansatsu(service_name="test-service", dashboard_url=None)
+
+    def worker():
+        for _ in range(1000):
+            obs.log_method_performance("work", 2.0)
+            obs.log_method_llm_usage("work", 1, 2, 3)
+        obs.log_metric("errors", 1)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    metrics = obs._snapshot_metrics()
+    assert metrics["total_calls"] == 4000
+    assert metrics["errors"] == 4
+    assert metrics["llm_total_tokens"] == 12000
+    assert metrics["method_stats"]["work"] == {
+        "calls": 4000, "total_duration_ms": 8000.0,
+        "prompt_tokens": 4000, "completion_tokens": 8000, "total_tokens": 12000,
+    }
+
+def test_shards_of_exited_threads_are_folded_in():
+    """
+    Tests that counter shards left by finished threads are merged once and dropped, without losing counts.
+    """
+    import threading
+
+    obs = Kansatsu(service_name="test-service", dashboard_url=None)
+    for _ in range(50):
+        t = threading.Thread(target=obs.log_method_performance, args=("short_lived", 1.0))
+        t.start()
+        t.join()
+    obs.log_method_performance("short_lived", 1.0)
+
+    for _ in range(2):
+        metrics = obs._snapshot_metrics()
+        assert metrics["total_calls"] == 51
+        assert metrics["method_stats"]["short_lived"]["calls"] == 51
+    assert len(obs._counter_shards) == 1
+
+@patch('kansatsu.agent.requests.Session.post')
+def test_findings_are_reported_as_one_alert_batch(mock_post):
+    """
+    Tests that every finding from one check is sent to the dashboard in a single rai_alerts event.
+    """
+    obs = Kansatsu(service_name="test-service", dashboard_url=DUMMY_URL)
+    obs.nlp = None
+    obs.check_responsible_ai("Mail jane@example.com, SSN 123-45-6789.", MagicMock())
+    obs.flush()
+
+    alert_events = [e for e in sent_events(mock_post) if e['type'].startswith('rai_alert')]
+    assert len(alert_events) == 1
+    assert alert_events[0]['type'] == 'rai_alerts'
+    assert {a['type'] for a in alert_events[0]['alerts']} == {"EMAIL", "SSN"}
+    assert len(obs._metrics["rai_alerts"]) == 2
+
+def test_usage_adapter_is_resolved_once_per_result_type():
+    """
+    Tests that token usage is read for Gemini and Anthropic style results and the
+    reader is remembered for the result type.
+    """
+    from kansatsu.agent import _USAGE_ADAPTERS, _gemini_usage, _anthropic_usage
+
+    class GeminiUsage:
+        prompt_token_count, candidates_token_count, total_token_count = 3, 4, 7
+    class GeminiResponse:
+        usage_metadata = GeminiUsage()
+    class AnthropicUsage:
+        input_tokens, output_tokens = 10, 5
+    class AnthropicResponse:
+        usage = AnthropicUsage()
+
+    obs = Kansatsu(service_name="test-service", dashboard_url=None)
+
+    @obs.monitor(track_tokens=True)
+    def call(response):
+        return response
+
+    call(GeminiResponse())
+    call(AnthropicResponse())
+    call(AnthropicResponse())
+
+    assert _USAGE_ADAPTERS[GeminiResponse] is _gemini_usage
+    assert _USAGE_ADAPTERS[AnthropicResponse] is _anthropic_usage
+    assert obs._snapshot_metrics()["method_stats"]["call"]["total_tokens"] == 7 + 15 + 15
+
+def test_result_with_unexpected_usage_shape_records_no_tokens():
+    """
+    Tests that a result whose shape differs from the reader cached for its type records
+    0 tokens instead of raising into the monitored call.
+    """
+    class OpenAIUsage:
+        prompt_tokens, completion_tokens, total_tokens = 1, 2, 3
+    class Response:
+        def __init__(self, usage):
+            self.usage = usage
+
+    obs = Kansatsu(service_name="test-service", dashboard_url=None)
+
+    @obs.monitor(track_tokens=True)
+    def call(response):
+        return response
+
+    call(Response(OpenAIUsage()))
+    no_usage = Response(None)
+    del no_usage.usage
+    assert call(no_usage) is no_usage
+
+    stats = obs._snapshot_metrics()
+    assert stats["method_stats"]["call"]["total_tokens"] == 3
+    assert stats.get("errors", 0) == 0
+
+def test_log_io_records_only_shapes_by_default():
+    """
+    Tests that without KANSATSU_LOG_IO=1, log_io records the argument count and result type, not payloads.
+    """
+    obs = Kansatsu(service_name="test-service", dashboard_url=None)
+    span = MagicMock()
+    obs._record_call_input(span, test_log_io_records_only_shapes_by_default, ("secret prompt",), {"k": 1})
+    obs._record_call_result(span, "call", "secret answer", False, True)
+    span.add_event.assert_not_called()
+    span.set_attribute.assert_any_call("function.arg_count", 2)
+    span.set_attribute.assert_any_call("function.result_type", "str")
+
+@patch('kansatsu.agent._LOG_IO_ENABLED', True)
+def test_log_io_clips_large_arguments_before_serializing():
+    """
+    Tests that captured inputs are cut down before json.dumps so huge arguments stay cheap.
+    """
+    from kansatsu.agent import _clip_for_log, _LOG_IO_MAX_CHARS, _LOG_IO_MAX_ITEMS
+
+    clipped = _clip_for_log({"prompt": "x" * 100_000, "history": list(range(100_000)), "nested": [[[["deep"]]]]})
+    assert len(clipped["prompt"]) == _LOG_IO_MAX_CHARS
+    assert clipped["history"] == list(range(_LOG_IO_MAX_ITEMS))
+    assert clipped["nested"] == [["<list of 1 items>"]]
+
+    obs = Kansatsu(service_name="test-service", dashboard_url=None)
+    span = MagicMock()
+    obs._record_call_input(span, test_log_io_clips_large_arguments_before_serializing, ("y" * 100_000,), {})
+    (event_name, attributes), _ = span.add_event.call_args
+    assert event_name == "function_input"
+    assert len(attributes["input"]) <= _LOG_IO_MAX_CHARS
@@ -0,0 +1,46 @@
+# FILE: tests/test_cache.py
+
+from kansatsu.cache import SemanticCache
+
+VECTORS = {
+    "area of circle r=10": [1.0, 0.0, 0.0],
+    "circle radius 10": [0.95, 0.05, 0.0],
+    "square side 4": [0.0, 1.0, 0.0],
+}
+
+def make_cache(**kwargs):
+    return SemanticCache(embed_fn=lambda text: VECTORS[text], threshold=0.9, **kwargs)
+
+def test_paraphrase_hits_and_unrelated_query_misses():
+    cache = make_cache()
+    cache.put(cache.make_key("area of circle r=10"), {"tool_name": "calculate_circle_area"})
+
+    assert cache.get(cache.make_key("circle radius 10")) == (True, {"tool_name": "calculate_circle_area"})
+    assert cache.get(cache.make_key("square side 4")) == (False, None)
+
+def test_partitions_are_never_compared():
+    cache = make_cache(partition_fn=lambda text: "circle" in text)
+    cache.put(cache.make_key("area of circle r=10"), "circle")
+
+    hit, _ = cache.get(cache.make_key("square side 4"))
+    assert not hit
+
+def test_cached_values_are_copies():
+    """Mutating a returned value must not change what later hits receive."""
+    cache = make_cache()
+    key = cache.make_key("area of circle r=10")
+    cache.put(key, {"parameters": {}})
+
+    _, value = cache.get(key)
+    value["parameters"]["radius"] = 10.0
+
+    assert cache.get(key) == (True, {"parameters": {}})
+
+def test_oldest_entries_are_evicted():
+    cache = make_cache(max_entries=1)
+    cache.put(cache.make_key("area of circle r=10"), "circle")
+    cache.put(cache.make_key("square side 4"), "square")
+
+    assert len(cache) == 1
+    assert cache.get(cache.make_key("circle radius 10")) == (False, None)
+    assert cache.get(cache.make_key("square side 4")) == (True, "square")
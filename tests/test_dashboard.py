@@ -0,0 +1,369 @@
+# FILE: tests/test_dashboard.py
+
+import sys
+import threading
+
+import pytest
+from dash.exceptions import PreventUpdate
+
+from kansatsu import dashboard
+
+def test_batch_update_applies_every_event():
+    """A 'batch' payload is unpacked and each event applied as if posted on its own."""
+    client = dashboard.server.test_client()
+    before = dashboard.app_data["general_stats"]["interaction_count"].value
+
+    response = client.post('/update', json={"type": "batch", "events": [
+        {"type": "interaction_time", "duration_ms": 100.0},
+        {"type": "interaction_time", "duration_ms": 300.0},
+    ]})
+
+    assert response.status_code == 200
+    assert dashboard.app_data["general_stats"]["interaction_count"].value == before + 2
+
+def test_update_batch_accepts_a_bare_array():
+    """/update_batch applies every event in a JSON array body."""
+    client = dashboard.server.test_client()
+    before = dashboard.app_data["general_stats"]["errors"].value
+
+    response = client.post('/update_batch', data=b'[{"type":"error"},{"type":"error"}]', headers={"Content-Type": "application/json"})
+
+    assert response.status_code == 200
+    assert dashboard.app_data["general_stats"]["errors"].value == before + 2
+
+def test_one_bad_event_does_not_drop_the_rest_of_a_batch():
+    """A malformed event mid-batch is skipped; the events around it are still applied."""
+    client = dashboard.server.test_client()
+    errors = dashboard.app_data["general_stats"]["errors"].value
+    interactions = dashboard.app_data["general_stats"]["interaction_count"].value
+
+    response = client.post('/update', json={"type": "batch", "events": [
+        {"type": "error"},
+        {"type": "method_performance", "name": "missing_duration"},
+        {"type": "interaction_time", "duration_ms": 5.0},
+    ]})
+    assert response.status_code == 200
+    response = client.post('/update_batch', json=[{"type": "error"}, "not an event", {"type": "error"}])
+    assert response.status_code == 200
+
+    assert dashboard.app_data["general_stats"]["errors"].value == errors + 3
+    assert dashboard.app_data["general_stats"]["interaction_count"].value == interactions + 1
+
+def test_malformed_update_bodies_are_rejected():
+    """Bodies that aren't JSON, or aren't the object/array an endpoint expects, get a 400 rather than a 500."""
+    client = dashboard.server.test_client()
+    headers = {"Content-Type": "application/json"}
+
+    assert client.post('/update', data=b'{"type": "error"', headers=headers).status_code == 400
+    assert client.post('/update', data=b'[{"type": "error"}]', headers=headers).status_code == 400
+    assert client.post('/update_batch', data=b'not json', headers=headers).status_code == 400
+    assert client.post('/update_batch', data=b'{"type": "error"}', headers=headers).status_code == 400
+
+def test_live_graphs_only_send_new_points():
+    """The figure is rendered once with full data, then extended with just the points added since."""
+    dashboard.app_data["live_graphs"].clear()
+    dashboard.apply_update({"type": "method_llm_usage", "name": "llm_call", "tokens": {"prompt": 5, "completion": 7, "total": 12}})
+    dashboard.apply_update({"type": "method_performance", "name": "llm_call", "duration_ms": 10.0})
+
+    figure, _, _, rendered, sent = dashboard.update_live_graph(1, None, None)
+    assert rendered == ['llm_call']
+    assert list(figure.data[1].y) == [12]
+
+    with pytest.raises(PreventUpdate):
+        dashboard.update_live_graph(2, rendered, sent)
+
+    dashboard.apply_update({"type": "method_performance", "name": "llm_call", "duration_ms": 11.0})
+    dashboard.apply_update({"type": "method_performance", "name": "llm_call", "duration_ms": 12.0})
+    figure, _, extension, _, sent = dashboard.update_live_graph(3, rendered, sent)
+    assert figure is dashboard.dash.no_update
+    new_data, trace_indices, max_points = extension
+    assert [y.tolist() for y in new_data['y']] == [[1, 1], [0, 0]]
+    assert trace_indices == [0, 1]
+    assert max_points == dashboard.MAX_EXTENDED_POINTS
+
+    with pytest.raises(PreventUpdate):
+        dashboard.update_live_graph(4, rendered, sent)
+
+def test_every_open_page_gets_new_points():
+    """Each page tracks what it has been sent, so one page polling first doesn't starve another."""
+    dashboard.app_data["live_graphs"].clear()
+    dashboard.apply_update({"type": "method_performance", "name": "shared_call", "duration_ms": 1.0})
+    pages = [dashboard.update_live_graph(1, None, None)[3:] for _ in range(2)]
+
+    dashboard.apply_update({"type": "method_performance", "name": "shared_call", "duration_ms": 2.0})
+    for rendered, sent in pages:
+        new_data, _, _ = dashboard.update_live_graph(2, rendered, sent)[2]
+        assert [len(y) for y in new_data['y']] == [1, 1]
+
+def test_rebuild_for_new_method_keeps_ui_state_and_page_cursor():
+    """A page rebuilt for a new method keeps uirevision, then gets only later points; other pages are unaffected."""
+    dashboard.app_data["live_graphs"].clear()
+    dashboard.apply_update({"type": "method_performance", "name": "old_call", "duration_ms": 1.0})
+    first = dashboard.update_live_graph(1, None, None)
+    other_rendered, other_sent = dashboard.update_live_graph(1, None, None)[3:]
+
+    dashboard.apply_update({"type": "method_performance", "name": "new_call", "duration_ms": 1.0})
+    rebuilt, _, extension, rendered, sent = dashboard.update_live_graph(2, first[3], first[4])
+    assert extension is dashboard.dash.no_update
+    assert rebuilt.layout.uirevision == first[0].layout.uirevision
+    assert sent == {"old_call": [1, 1], "new_call": [1, 1]}
+
+    dashboard.apply_update({"type": "method_performance", "name": "old_call", "duration_ms": 1.0})
+    new_data, trace_indices, _ = dashboard.update_live_graph(3, rendered, sent)[2]
+    assert trace_indices == [0, 1] and [len(y) for y in new_data['y']] == [1, 1]
+
+    other_figure, _, _, other_rendered, other_sent = dashboard.update_live_graph(3, other_rendered, other_sent)
+    assert other_rendered == ["old_call", "new_call"]
+    assert len(other_figure.data[0].x) == 2
+
+def test_full_render_downsamples_long_histories():
+    """A method's whole retained history is kept, but at most MAX_PLOTTED_POINTS of it is plotted."""
+    dashboard.app_data["live_graphs"].clear()
+    for _ in range(dashboard.MAX_PLOTTED_POINTS * 2):
+        dashboard.apply_update({"type": "method_performance", "name": "busy_call", "duration_ms": 1.0})
+
+    figure = dashboard.update_live_graph(1, None, None)[0]
+    assert len(figure.data[0].x) == dashboard.MAX_PLOTTED_POINTS
+    latest = dashboard.tail(dashboard.app_data["live_graphs"]["busy_call"], 'timestamps', 1)
+    assert figure.data[0].x[-1] == dashboard.as_local_datetimes(latest)[0]
+
+def test_extending_past_the_cap_rebuilds_from_a_fresh_downsample():
+    """Rather than letting maxPoints drop the downsampled history, a page about to overflow gets a rebuilt figure."""
+    dashboard.app_data["live_graphs"].clear()
+    for _ in range(dashboard.MAX_PLOTTED_POINTS * 2):
+        dashboard.apply_update({"type": "method_performance", "name": "busy_call", "duration_ms": 1.0})
+    figure, _, _, rendered, sent = dashboard.update_live_graph(1, None, None)
+    assert sent == {"busy_call": [dashboard.MAX_PLOTTED_POINTS * 2, dashboard.MAX_PLOTTED_POINTS]}
+
+    for _ in range(dashboard.MAX_EXTENDED_POINTS - dashboard.MAX_PLOTTED_POINTS):
+        dashboard.apply_update({"type": "method_performance", "name": "busy_call", "duration_ms": 1.0})
+    _, _, extension, _, sent = dashboard.update_live_graph(2, rendered, sent)
+    assert extension is not dashboard.dash.no_update
+    assert sent["busy_call"][1] == dashboard.MAX_EXTENDED_POINTS
+
+    dashboard.apply_update({"type": "method_performance", "name": "busy_call", "duration_ms": 1.0})
+    rebuilt, _, extension, _, sent = dashboard.update_live_graph(3, rendered, sent)
+    assert extension is dashboard.dash.no_update
+    assert len(rebuilt.data[0].x) == dashboard.MAX_PLOTTED_POINTS
+    assert sent["busy_call"] == [dashboard.app_data["live_graphs"]["busy_call"]['appended'], dashboard.MAX_PLOTTED_POINTS]
+
+def test_live_figure_has_a_row_per_method():
+    """Every method gets its own subplot row in a single figure, extended by trace index."""
+    dashboard.app_data["live_graphs"].clear()
+    for name in ("first_call", "second_call"):
+        dashboard.apply_update({"type": "method_performance", "name": name, "duration_ms": 1.0})
+    figure, _, _, rendered, sent = dashboard.update_live_graph(1, None, None)
+    assert rendered == ["first_call", "second_call"]
+    assert len(figure.data) == 4
+    assert figure.layout.uirevision == 'live-graph'
+
+    dashboard.apply_update({"type": "method_performance", "name": "second_call", "duration_ms": 1.0})
+    _, trace_indices, _ = dashboard.update_live_graph(2, rendered, sent)[2]
+    assert trace_indices == [2, 3]
+
+def test_method_details_keep_running_average_duration():
+    """Each method_performance event folds its duration into the method's running mean."""
+    dashboard.app_data["method_details"].pop("avg_call", None)
+    for duration in (10.0, 20.0, 60.0):
+        dashboard.apply_update({"type": "method_performance", "name": "avg_call", "duration_ms": duration})
+    stat = dashboard.app_data["method_details"]["avg_call"]
+    assert stat.calls == 3
+    assert stat.avg_duration_ms == pytest.approx(30.0)
+
+def test_rai_alerts_batch_extends_alert_list():
+    """An 'rai_alerts' payload adds every alert it carries."""
+    before = dashboard.app_data["quality_rai"]["rai_alert_count"]
+    dashboard.apply_update({"type": "rai_alerts", "alerts": [
+        {"type": "EMAIL", "details": "Found at index 5"},
+        {"type": "SSN", "details": "Found at index 27"},
+    ]})
+    assert dashboard.app_data["quality_rai"]["rai_alert_count"] == before + 2
+
+def test_rai_alert_list_keeps_only_recent_alerts():
+    """Past MAX_RAI_ALERTS the oldest alerts are dropped from the list but still counted."""
+    before = dashboard.app_data["quality_rai"]["rai_alert_count"]
+    dashboard.apply_update({"type": "rai_alerts", "alerts": [
+        {"type": "EMAIL", "details": f"Found at index {i}"} for i in range(dashboard.MAX_RAI_ALERTS + 5)
+    ]})
+    count, _, items, _ = dashboard.update_rai_alerts(1, None)
+    assert count == f"{before + dashboard.MAX_RAI_ALERTS + 5}"
+    assert len(dashboard.app_data["quality_rai"]["rai_alerts"]) == dashboard.MAX_RAI_ALERTS
+    assert len(items) == dashboard.MAX_RAI_ALERTS
+
+def test_rai_alert_items_are_built_once_per_alert():
+    """The alert list only renders items for alerts that arrived since the last render."""
+    dashboard.apply_update({"type": "rai_alert", "alert": {"type": "EMAIL", "details": "Found at index 1"}})
+    _, _, items, version = dashboard.update_rai_alerts(1, None)
+
+    dashboard.apply_update({"type": "quality_feedback", "score": 5})
+    with pytest.raises(PreventUpdate):
+        dashboard.update_rai_alerts(2, version)
+
+    dashboard.apply_update({"type": "rai_alert", "alert": {"type": "SSN", "details": "Found at index 2"}})
+    _, _, new_items, _ = dashboard.update_rai_alerts(3, version)
+    assert new_items[-2] is items[-1]
+    assert all(item is not new_items[-1] for item in items)
+
+def test_quality_feedback_keeps_running_average():
+    """Quality scores are folded into a running sum and count rather than stored."""
+    qr = dashboard.app_data["quality_rai"]
+    qr["quality_sum"], qr["quality_count"] = 0, 0
+    for score in (5, 4, 3):
+        dashboard.apply_update({"type": "quality_feedback", "score": score})
+    assert (qr["quality_sum"], qr["quality_count"]) == (12, 3)
+    assert dashboard.update_quality_rai(1, None)[0] == "4.00"
+
+def test_update_accepts_raw_json_body():
+    """The /update route parses the request body itself, as the agent posts pre-encoded bytes."""
+    client = dashboard.server.test_client()
+    before = dashboard.app_data["general_stats"]["errors"].value
+    response = client.post('/update', data=b'{"type":"error"}', headers={"Content-Type": "application/json"})
+    assert response.status_code == 200
+    assert response.get_json() == {"success": True}
+    assert dashboard.app_data["general_stats"]["errors"].value == before + 1
+
+def test_final_table_lists_slowest_methods_first():
+    """The end-of-session table keeps only the MAX_TABLE_ROWS slowest methods by average time."""
+    dashboard.app_data["method_details"].clear()
+    for i in range(dashboard.MAX_TABLE_ROWS + 10):
+        dashboard.apply_update({"type": "method_performance", "name": f"m{i}", "duration_ms": float(i)})
+    dashboard.session_ended.set()
+    try:
+        (table,), _ = dashboard.update_final_table(1, None)
+        (cached,), _ = dashboard.update_final_table(2, None)
+    finally:
+        dashboard.session_ended.clear()
+
+    assert cached is table
+    names = [row['Method Name'] for row in table.data]
+    assert len(names) == dashboard.MAX_TABLE_ROWS
+    assert names[0] == f"m{dashboard.MAX_TABLE_ROWS + 9}"
+    assert "m0" not in names
+
+def test_concurrent_updates_to_different_methods_are_all_counted():
+    """Posts for different methods take separate locks and none of their updates are lost."""
+    before = dashboard.app_data["general_stats"]["total_calls"].value
+
+    def post(name):
+        for _ in range(200):
+            dashboard.apply_update({"type": "method_performance", "name": name, "duration_ms": 1.0})
+
+    threads = [threading.Thread(target=post, args=(f"worker{i}",)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert dashboard.app_data["general_stats"]["total_calls"].value == before + 800
+    assert [dashboard.app_data["method_details"][f"worker{i}"].calls for i in range(4)] == [200] * 4
+
+def test_atomic_counter_reads_are_consistent_under_concurrency():
+    """Concurrent readers only ever see values between 0 and the final total, never going backwards."""
+    counter = dashboard.AtomicCounter()
+    bad_reads = []
+    done = threading.Event()
+
+    def increment():
+        for _ in range(20_000):
+            counter.increment()
+
+    def read():
+        last = 0
+        while not done.is_set():
+            value = counter.value
+            if value < last or value > 80_000:
+                bad_reads.append(value)
+            last = value
+
+    previous_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        writers = [threading.Thread(target=increment) for _ in range(4)]
+        for t in readers + writers:
+            t.start()
+        for t in writers:
+            t.join()
+        done.set()
+        for t in readers:
+            t.join()
+    finally:
+        sys.setswitchinterval(previous_interval)
+
+    assert bad_reads == []
+    assert counter.value == 80_000
+
+def test_atomic_counter_reads_do_not_count_as_increments():
+    """Reading an AtomicCounter repeatedly returns the same value until it is incremented."""
+    counter = dashboard.AtomicCounter()
+    assert (counter.value, counter.value) == (0, 0)
+    for _ in range(3):
+        counter.increment()
+    assert (counter.value, counter.value) == (3, 3)
+
+def test_callbacks_skip_ticks_when_their_section_is_unchanged():
+    """Each card callback re-renders only after an update to its own section."""
+    dashboard.apply_update({"type": "error"})
+    stats_version = dashboard.update_general_stats(1, None)[-1]
+    llm_version = dashboard.update_llm_usage(1, None)[-1]
+
+    with pytest.raises(PreventUpdate):
+        dashboard.update_general_stats(2, stats_version)
+
+    dashboard.apply_update({"type": "llm_cache", "hit": True})
+    with pytest.raises(PreventUpdate):
+        dashboard.update_general_stats(3, stats_version)
+    assert dashboard.update_llm_usage(3, llm_version)[-1] != llm_version
+
+def test_section_versions_stay_correct_with_concurrent_readers():
+    """Pages polling at once never see a version go backwards or miss the latest change."""
+    bad_versions = []
+    rendered = [None] * 4
+    done = threading.Event()
+
+    def post():
+        for _ in range(5_000):
+            dashboard.apply_update({"type": "llm_cache", "hit": False})
+
+    def poll(page):
+        while not done.is_set():
+            try:
+                version = dashboard.check_version("llm_usage", rendered[page])
+            except PreventUpdate:
+                continue
+            if rendered[page] is not None and version < rendered[page]:
+                bad_versions.append(version)
+            rendered[page] = version
+
+    previous_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        pages = [threading.Thread(target=poll, args=(page,)) for page in range(4)]
+        writers = [threading.Thread(target=post) for _ in range(2)]
+        for t in pages + writers:
+            t.start()
+        for t in writers:
+            t.join()
+        done.set()
+        for t in pages:
+            t.join()
+    finally:
+        sys.setswitchinterval(previous_interval)
+
+    assert bad_versions == []
+    final = dashboard.section_versions["llm_usage"].value
+    for page in range(4):
+        if rendered[page] != final:
+            assert dashboard.check_version("llm_usage", rendered[page]) == final
+        with pytest.raises(PreventUpdate):
+            dashboard.check_version("llm_usage", final)
+
+def test_final_table_waits_for_session_end():
+    """The summary table isn't built until a session_end event arrives."""
+    with pytest.raises(PreventUpdate):
+        dashboard.update_final_table(1, None)
+    dashboard.apply_update({"type": "session_end"})
+    try:
+        assert dashboard.session_ended.is_set()
+    finally:
+        dashboard.session_ended.clear()